@@ -0,0 +1,70 @@
+import time
+import numpy as np
+
+def to_screen(points, offset_x, offset_y, scale=1):
+	# grid-relative frame pixels -> screen points, for a whole grid at once
+	points = (np.asarray(points, dtype=float).reshape(-1, 2) + (offset_x, offset_y)) / scale
+	return np.round(points).astype(int).tolist()
+
+class Clicker:
+	# clicks are (x, y, count) in screen points, sent as one batch
+
+	name = None
+
+	def __init__(self):
+		self.timings = []
+
+	def click_all(self, clicks):
+		start = time.perf_counter()
+		self.send(clicks)
+		self.timings.append(time.perf_counter() - start)
+
+	def send(self, clicks):
+		raise NotImplementedError
+
+	def report(self):
+		if self.timings:
+			print(f"{self.name}: {len(self.timings)} batches, {sum(self.timings) / len(self.timings) * 1e3:.1f} ms per batch")
+
+class PynputClicker(Clicker):
+	name = 'pynput'
+
+	def __init__(self):
+		super().__init__()
+		from pynput import mouse
+		self.mouse = mouse.Controller()
+		self.button = mouse.Button.left
+
+	def send(self, clicks):
+		for x, y, count in clicks:
+			self.mouse.position = (x, y)
+			self.mouse.click(self.button, count)
+
+class PyAutoGuiClicker(Clicker):
+	name = 'pyautogui'
+
+	def __init__(self):
+		super().__init__()
+		import pyautogui
+		self.pyautogui = pyautogui
+
+	def send(self, clicks):
+		# still pays pyautogui's failsafe check on every call
+		for x, y, count in clicks:
+			self.pyautogui.click(x, y, clicks=count, interval=0, _pause=False)
+
+class RecordingClicker(Clicker):
+	# dry run: keeps the clicks instead of moving the mouse
+	name = 'dry-run'
+
+	def __init__(self):
+		super().__init__()
+		self.clicks = []
+
+	def send(self, clicks):
+		self.clicks.extend(clicks)
+
+clickers = {clicker.name: clicker for clicker in (PynputClicker, PyAutoGuiClicker, RecordingClicker)}
+
+def make_clicker(name='pynput'):
+	return clickers[name]()
@@ -0,0 +1,254 @@
+import random
+import sys
+import tempfile
+import time
+import cv2
+import numpy as np
+import actuate
+import board_engine
+import capture
+import queen_generator
+import queen_solver
+import tango_solver
+import tango_templates
+
+def timed(function, repeat=1):
+	start = time.perf_counter()
+	for _ in range(repeat):
+		function()
+	return (time.perf_counter() - start) / repeat
+
+def load_text_table(n):
+	with open(f'solution_{n}.txt', 'r') as f:
+		return [[int(x) for x in line.strip().split(',')] for line in f]
+
+def bench_solution_loading(sizes=range(5, 10)):
+	print(f"{'n':>3} {'text (ms)':>12} {'cold bin (ms)':>14} {'warm bin (us)':>14}")
+	for n in sizes:
+		text = timed(lambda: load_text_table(n), repeat=5)
+		queen_solver.solution_tables.pop(n, None)
+		cold = timed(lambda: queen_solver.load_solution_table(n))
+		warm = timed(lambda: queen_solver.load_solution_table(n), repeat=1000)
+		print(f"{n:>3} {text * 1e3:>12.3f} {cold * 1e3:>14.3f} {warm * 1e6:>14.3f}")
+
+def random_paving(n, seed=0):
+	# every label present so the filter really scans the whole table
+	rng = np.random.default_rng(seed)
+	paving = rng.integers(0, n, (n, n))
+	paving.flat[rng.permutation(n * n)[:n]] = np.arange(n)
+	return paving
+
+def bench_table_filter(n=9, pavings=20):
+	solutions = queen_solver.load_solution_table(n)
+	boards = [random_paving(n, seed) for seed in range(pavings)]
+
+	def loop():
+		for paving in boards:
+			[solution for solution in solutions if queen_solver.solution_valid_for_paving(paving, solution)]
+
+	def vectorized():
+		for paving in boards:
+			queen_solver.filter_solutions(paving, solutions)
+
+	print(f"{n}x{n}, {len(solutions)} permutations, all matches per paving")
+	print(f"python loop: {timed(loop) / pavings * 1e3:.3f} ms")
+	print(f"vectorized:  {timed(vectorized) / pavings * 1e3:.3f} ms")
+
+def bench_solution_index(n=9, pavings=50):
+	solutions = queen_solver.load_solution_table(n)
+	rng = random.Random(0)
+	boards = [np.array(queen_generator.grow_paving(solutions[rng.randrange(len(solutions))].tolist(), rng)) for _ in range(pavings)]
+	text = load_text_table(n)
+	queen_solver.solution_indexes.pop(n, None)
+	build = timed(lambda: queen_solver.load_solution_index(n))
+
+	def scan():
+		for paving in boards:
+			next(solution for solution in text if queen_solver.solution_valid_for_paving(paving, solution))
+
+	def vectorized():
+		for paving in boards:
+			queen_solver.filter_solutions(paving, solutions, first=True)
+
+	def index():
+		for paving in boards:
+			queen_solver.solve_with_index(paving)
+
+	print(f"{n}x{n}, index load/build: {build * 1e3:.3f} ms")
+	print(f"linear scan: {timed(scan) / pavings * 1e3:.3f} ms")
+	print(f"vectorized:  {timed(vectorized) / pavings * 1e3:.3f} ms")
+	print(f"index:       {timed(index) / pavings * 1e3:.3f} ms")
+
+def bench_puzzle_generation(sizes=range(7, 13), duration=5.0):
+	for n in sizes:
+		rate = queen_generator.puzzles_per_second(n, duration)
+		print(f"{n:>3}x{n:<3} {rate:8.2f} unique puzzles/s")
+
+def bench_debug_images(filename='original.png', frames=50):
+	grid = queen_solver.load_screenshot(filename)
+	with tempfile.TemporaryDirectory() as dump_dir:
+		off = timed(lambda: queen_solver.extract_cells(grid), repeat=frames)
+		memory = timed(lambda: queen_solver.extract_cells(grid, queen_solver.DebugImages()), repeat=frames)
+		dump = timed(lambda: queen_solver.extract_cells(grid, queen_solver.DebugImages(dump_dir)), repeat=frames)
+	print(f"extract_cells on {filename}, per frame")
+	print(f"debug off:       {off * 1e3:.3f} ms")
+	print(f"debug in memory: {memory * 1e3:.3f} ms")
+	print(f"debug dumped:    {dump * 1e3:.3f} ms")
+
+def bench_frame_change(filename='original.png', frames=50):
+	frame = queen_solver.load_screenshot(filename)
+	changes = capture.FrameChangeDetector()
+	changes.changed(frame)
+
+	def pipeline():
+		detected = queen_solver.detect_grid(frame)
+		if detected is not None:
+			queen_solver.extract_grid(detected[0])
+
+	print(f"idle frame from {filename}")
+	print(f"full pipeline:   {timed(pipeline, repeat=frames) * 1e3:.3f} ms")
+	print(f"change detector: {timed(lambda: changes.changed(frame), repeat=frames) * 1e3:.3f} ms")
+
+def overlap(a, b):
+	ax, ay, aw, ah = a
+	bx, by, bw, bh = b
+	w = min(ax + aw, bx + bw) - max(ax, bx)
+	h = min(ay + ah, by + bh) - max(ay, by)
+	inter = max(w, 0) * max(h, 0)
+	return inter / (aw * ah + bw * bh - inter)
+
+def bench_cell_extraction(filenames=('original.png',), frames=50):
+	for filename in filenames:
+		grid = queen_solver.load_screenshot(filename)
+		gray = cv2.cvtColor(grid, cv2.COLOR_BGR2GRAY)
+		_, binary = cv2.threshold(gray, 10, 255, cv2.THRESH_BINARY_INV)
+		lattice = queen_solver.extract_cells_lattice(binary)
+		contours = queen_solver.extract_cells_contours(binary)
+		matched = sum(any(overlap(cell, other) >= 0.7 for other in contours) for cell in lattice)
+		print(f"{filename}: lattice {len(lattice)} cells, contours {len(contours)} cells, {matched} lattice cells match a contour cell")
+		print(f"lattice:  {timed(lambda: queen_solver.extract_cells_lattice(binary), repeat=frames) * 1e3:.3f} ms")
+		print(f"contours: {timed(lambda: queen_solver.extract_cells_contours(binary), repeat=frames) * 1e3:.3f} ms")
+
+def bench_board_engine(n=10, boards=1000):
+	rng = random.Random(0)
+	games = []
+	for _ in range(boards):
+		solution = queen_generator.random_solution(n, rng)
+		games.append((queen_generator.grow_paving(solution, rng), solution))
+
+	def play():
+		for paving, solution in games:
+			engine = board_engine.BoardEngine(paving)
+			for row, col in enumerate(solution):
+				if engine.can_place_queen(row, col):
+					engine.place_queen(row, col)
+			engine.victory()
+
+	print(f"{n}x{n}: {boards / timed(play):.0f} headless boards played per second")
+
+def random_tango_puzzle(solutions, rng, givens=0.3, links=6):
+	solution = solutions[rng.randrange(len(solutions))]
+	n = len(solution)
+	grid_symbole = np.array([[solution[r, c] if rng.random() < givens else 0 for c in range(n)] for r in range(n)], dtype=np.uint32)
+	puzzle_links = {}
+	for _ in range(links):
+		r, c = rng.randrange(n), rng.randrange(n - 1)
+		if rng.random() < 0.5:
+			cell, other = (r, c), (r, c + 1)
+		else:
+			cell, other = (c, r), (c + 1, r)
+		puzzle_links.setdefault(cell, []).append((other, bool(solution[cell] != solution[other])))
+	return grid_symbole, puzzle_links
+
+def bench_tango_filter(puzzles=50):
+	solutions = tango_solver.load_solutions()
+	rng = random.Random(0)
+	boards = [random_tango_puzzle(solutions, rng) for _ in range(puzzles)]
+
+	def loop():
+		for grid_symbole, links in boards:
+			[solution for solution in solutions if tango_solver.solution_is_valid(solution, grid_symbole, links)]
+
+	def vectorized():
+		for grid_symbole, links in boards:
+			tango_solver.filter_tango_solutions(solutions, grid_symbole, links)
+
+	def search():
+		for grid_symbole, links in boards:
+			tango_solver.solve_tango(grid_symbole, links)
+
+	print(f"{len(solutions)} solutions, all matches per puzzle")
+	print(f"python loop: {timed(loop) / puzzles * 1e3:.3f} ms")
+	print(f"vectorized:  {timed(vectorized) / puzzles * 1e3:.3f} ms")
+	print(f"search (first match): {timed(search) / puzzles * 1e3:.3f} ms")
+
+def bench_tango_generation(sizes=(4, 6)):
+	recursive = timed(tango_solver.generate_all_solutions_recursive)
+	rows = timed(tango_solver.generate_all_solutions)
+	same = np.array_equal(tango_solver.generate_all_solutions_recursive(), tango_solver.generate_all_solutions())
+	print(f"6x6 recursive: {recursive * 1e3:.1f} ms, row patterns: {rows * 1e3:.1f} ms, same table: {same}")
+	for n in sizes:
+		solutions = tango_solver.generate_all_solutions(n)
+		print(f"{n:>3}x{n:<3} {len(solutions):8d} grids in {timed(lambda: tango_solver.generate_all_solutions(n)) * 1e3:.1f} ms")
+
+def bench_tango_recognition(filename='tango.png', frames=50):
+	image = queen_solver.load_screenshot(filename)
+	grid_image = tango_solver.detect_grid(image)[0] if image is not None else None
+	if grid_image is None:
+		print(f"no tango grid in {filename}")
+		return
+	binary = tango_solver.grid_binary(grid_image)
+	regions = tango_solver.patch_regions(grid_image)
+	groups = tango_solver.region_groups(regions)
+	kinds = tango_solver.classify_components(binary, regions)
+	symbols, links = tango_solver.process_grid_image_per_patch(grid_image)
+	batched_symbols, batched_links = tango_solver.kinds_to_grid(kinds)
+	print(f"{filename}: per patch and components agree: {np.array_equal(symbols, batched_symbols) and links == batched_links}")
+	print(f"per patch:  {timed(lambda: tango_solver.process_grid_image_per_patch(grid_image), repeat=frames) * 1e3:.3f} ms")
+	print(f"components: {timed(lambda: tango_solver.classify_components(tango_solver.grid_binary(grid_image), regions), repeat=frames) * 1e3:.3f} ms")
+	classifier = tango_solver.load_templates()
+	if classifier is None:
+		print(f"no {tango_solver.templates_file}, templates skipped")
+		return
+	agree = (classifier.classify(tango_templates.patch_vectors(binary, regions), groups) == kinds).mean()
+	print(f"templates:  {timed(lambda: classifier.classify(tango_templates.patch_vectors(tango_solver.grid_binary(grid_image), regions), groups), repeat=frames) * 1e3:.3f} ms, {agree:.0%} of patches agree with components")
+
+def bench_actuation(n=9, puzzles=200):
+	# dry run only: the other backends move the real mouse, their batches
+	# are timed by the runtime itself (clicker.report() on exit)
+	clicker = actuate.make_clicker('dry-run')
+	solver = queen_solver.QueensSolver()
+	rng = random.Random(0)
+	boards = []
+	for _ in range(puzzles):
+		solution = queen_generator.random_solution(n, rng)
+		paving = np.array(queen_generator.grow_paving(solution, rng))
+		cells = [(col * 40, row * 40, 38, 38) for row in range(n) for col in range(n)]
+		boards.append((cells, paving))
+
+	def queens():
+		for puzzle in boards:
+			solver.actuate(clicker, (100, 200, n * 40, n * 40), puzzle, solver.solve(puzzle), 2)
+
+	print(f"{n}x{n} solve, map and record {n} clicks: {timed(queens) / puzzles * 1e3:.3f} ms")
+	clicker.report()
+
+benchmarks = {
+	'loading': bench_solution_loading,
+	'filter': bench_table_filter,
+	'index': bench_solution_index,
+	'generator': bench_puzzle_generation,
+	'debug': bench_debug_images,
+	'change': bench_frame_change,
+	'cells': bench_cell_extraction,
+	'engine': bench_board_engine,
+	'tango': bench_tango_filter,
+	'tango-generator': bench_tango_generation,
+	'tango-vision': bench_tango_recognition,
+	'clicks': bench_actuation,
+}
+
+if __name__ == "__main__":
+	for name in sys.argv[1:] or benchmarks:
+		print(f"== {name}")
+		benchmarks[name]()
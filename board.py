@@ -1,6 +1,10 @@
+import time
+from collections import deque
 import numpy as np
 import pygame as pg
 import matplotlib.pyplot as plt
+from board_engine import BoardEngine
+import timing
 
 BLACK = (0, 0, 0)
 WHITE = (255, 255, 255)
@@ -11,6 +15,8 @@ RED = (255, 0, 0)
 
 class Board:
     
+    queen_image: pg.Surface | None = None
+    
     def __init__(self, game, board_matrix: np.ndarray):
         self.game = game
         self.board_matrix: np.ndarray = board_matrix
@@ -18,13 +24,15 @@ class Board:
         self.board_width: int = self.board_matrix.shape[0]
         self.board_height: int = self.board_matrix.shape[1]
         self.n_queen: int = len(np.unique(self.board_matrix))
+        self.engine: BoardEngine = BoardEngine(board_matrix, observer=self)
         
         self.colors_list: list[tuple[int, int, int]]
-        self.colors_filled: list[list[tuple[int, int]]]
-        self.player_matrix: np.ndarray
-        self.queens_placed: int
         self.cells: np.ndarray
         self.subcells: np.ndarray
+        self.sprites: dict[tuple[str, int, int], pg.Surface] = {}
+        self.dirty_rects: list[pg.Rect] = []
+        self.full_redraw: bool = False
+        self.frame_times: dict[str, deque] = {"full": deque(maxlen=100), "dirty": deque(maxlen=100)}
         
         self.terminal_debug: bool = False
         self.use_right_click: bool = False
@@ -49,10 +57,21 @@ class Board:
     def row_width(self, i):
         return round(self.contour_line_size + 1 - (1+self.grid_line_size) % 2 + (self.game.width - self.contour_line_size * 2 - self.grid_line_size + 1) * i / self.board_width)
 
+    @property
+    def player_matrix(self) -> list[list[int]]:
+        return self.engine.player_matrix
+    
+    @property
+    def colors_filled(self) -> list[list[tuple[int, int]]]:
+        return self.engine.colors_filled
+    
+    @property
+    def queens_placed(self) -> int:
+        return self.engine.queens_placed
+
+    @timing.timed('board.reset_player')
     def reset_player(self):
-        self.player_matrix = np.zeros((self.board_width, self.board_height), dtype=int)
-        self.queens_placed = 0
-        self.colors_filled = [[] for _ in range(self.n_queen)]
+        self.engine.reset()
         self.init_display()
         self.update_screen()
         
@@ -60,8 +79,47 @@ class Board:
         self.display()
         self.create_grid()
         
+    @timing.timed('board.update_screen')
     def update_screen(self):
-        pg.display.flip()
+        if not self.full_redraw and not self.dirty_rects:
+            return
+        start = time.perf_counter()
+        if self.full_redraw:
+            pg.display.flip()
+            kind = "full"
+        else:
+            pg.display.update(self.dirty_rects)
+            kind = "dirty"
+        self.frame_times[kind].append(time.perf_counter() - start)
+        self.full_redraw = False
+        self.dirty_rects = []
+        
+    def get_queen_sprite(self, width, height):
+        key = ("queen", round(width), round(height))
+        if key not in self.sprites:
+            if Board.queen_image is None:
+                Board.queen_image = pg.image.load("assets/queen.png").convert_alpha()
+            self.sprites[key] = pg.transform.scale(Board.queen_image, key[1:])
+        return self.sprites[key]
+    
+    def get_cross_sprite(self, width, height):
+        key = ("cross", round(width), round(height))
+        if key not in self.sprites:
+            cross = pg.Surface(key[1:], pg.SRCALPHA)
+            left, top = self.cross_line_size, self.cross_line_size
+            right, bottom = width - self.cross_line_size, height - self.cross_line_size
+            pg.draw.line(cross, (0, 0, 0), (left, top), (right, bottom), self.cross_line_size)
+            pg.draw.line(cross, (0, 0, 0), (left, bottom), (right, top), self.cross_line_size)
+            self.sprites[key] = cross
+        return self.sprites[key]
+        
+    def mark_dirty(self, i, j):
+        self.dirty_rects.append(self.cells[i, j])
+        
+    def print_frame_times(self):
+        for kind, times in self.frame_times.items():
+            if times:
+                print(f"{kind} update: {sum(times) / len(times) * 1e3:.3f} ms over {len(times)} frames")
         
     def get_cell_coord(self, i, j):
         left = self.row_width(i) + self.grid_line_size - self.grid_line_size%2
@@ -77,6 +135,7 @@ class Board:
         return top + (cell_height - sub_height) / 2, left + (cell_width - sub_width) / 2, sub_width, sub_height
         
     def create_cells(self):
+        self.sprites.clear()
         self.cells = np.empty((self.board_width, self.board_height), dtype=pg.Rect)
         self.subcells = np.empty((self.board_width, self.board_height), dtype=pg.Rect)
         for i in range(self.board_width):
@@ -85,6 +144,7 @@ class Board:
                 self.subcells[i, j] = pg.Rect(*self.get_subcell_coord(i, j))
 
     def create_grid(self):
+        self.full_redraw = True
         pg.draw.line(self.screen, self.contour_color, (0, self.contour_line_size/2 - 1), (self.game.width - 1, self.contour_line_size/2 - 1), self.contour_line_size)
         pg.draw.line(self.screen, self.contour_color, (self.contour_line_size/2 - 1, 0), (self.contour_line_size/2 - 1,self.game.height - 1), self.contour_line_size)
         pg.draw.line(self.screen, self.contour_color, (self.game.width - self.contour_line_size/2, 0), (self.game.width - self.contour_line_size/2, self.game.height), self.contour_line_size)
@@ -100,9 +160,9 @@ class Board:
     def display(self):
         for i in range(self.board_width):
             for j in range(self.board_height):
-                if self.player_matrix[i, j] != 0 or True:
+                if self.player_matrix[i][j] != 0 or True:
                     pg.draw.rect(self.screen, self.get_col(self.board_matrix[i, j]), self.cells[i, j])
-        self.update_screen()
+        self.full_redraw = True
                     
     def init_colors(self):
         cmap = plt.cm.get_cmap('tab10', self.n_queen)
@@ -117,43 +177,20 @@ class Board:
         return pos[0] // cell_width, pos[1] // cell_height
     
     def victory(self, debug=False):
-        if self.n_queen != self.queens_placed:
-            if debug:
-                print(f"Wrong number of queens: {self.n_queen} not equal to {self.queens_placed}")
-            return False
-        if not all(map(len, self.colors_filled)):
-            if debug:
-                print(f"No queen for all colors: ", all(map(len, self.colors_filled)), map(len, self.colors_filled))
-            return False
-        for i in range(self.board_width):
-            for j in range(self.board_height):
-                if self.player_matrix[i, j] == 1:
-                    break
-            else:
-                if debug:
-                    print(f"No queen in line {i}")
-                return False
-        for j in range(self.board_height):
-            for i in range(self.board_width):
-                if self.player_matrix[i, j] == 1:
-                    break
-            else:
-                if debug:
-                    print(f"No queen in column {j}")
-                return False
-        return True
+        return self.engine.victory(debug)
     
     def check_victory(self):
         if self.victory():
             self.game.victory()
     
+    @timing.timed('board.left_click')
     def left_click(self, pos):
         i, j = self.get_cell(pos)
         col = self.board_matrix[i, j]
         if self.use_right_click:
-            if self.player_matrix[i, j] == 1:
+            if self.player_matrix[i][j] == 1:
                 self.remove_queen(i, j)
-            elif self.player_matrix[i, j] != 2 and (self.allow_wrong_placements or self.can_place_queen(i, j)):
+            elif self.player_matrix[i][j] != 2 and (self.allow_wrong_placements or self.can_place_queen(i, j)):
                 if self.colors_filled[col] != [] and not self.allow_double_colors:
                     for i, j in self.colors_filled[col]:
                         self.remove_queen(i, j)
@@ -161,80 +198,65 @@ class Board:
             else:
                 print("Cannot place Queen here")
         else:
-            if self.player_matrix[i, j] == 0:
+            if self.player_matrix[i][j] == 0:
                 self.place_noqueen(i, j)
-            elif self.player_matrix[i, j] == 2:
+            elif self.player_matrix[i][j] == 2:
                 self.remove_noqueen(i, j)
                 self.place_queen(i, j)
-            elif self.player_matrix[i, j] == 1:
+            elif self.player_matrix[i][j] == 1:
                 self.remove_queen(i, j)
             else:
                 raise NotImplementedError
             
     
+    @timing.timed('board.right_click')
     def right_click(self, pos):
         if self.use_right_click:
             i, j = self.get_cell(pos)
-            if self.player_matrix[i, j] == 2:
+            if self.player_matrix[i][j] == 2:
                 self.remove_noqueen(i, j)
                 return            
-            if self.player_matrix[i, j] == 1:
+            if self.player_matrix[i][j] == 1:
                 if self.terminal_debug:
                     print("Queen already here")
                 return            
             self.place_noqueen(i, j)
     
     def can_place_queen(self, i, j):
-        col = self.board_matrix[i, j]
-        for _j in range(self.board_height):
-            if self.player_matrix[i, _j] == 1 and self.board_matrix[i, _j] != col:
-                return False
-        for _i in range(self.board_width):
-            if self.player_matrix[_i, j] == 1 and self.board_matrix[_i, j] != col:
-                return False
-        adjacents = [(i + dep_i, j + dep_j) for dep_i in [-1, 0, 1]
-                                            for dep_j in [-1, 0, 1]
-                                            if (dep_i != 0 or dep_j != 0) 
-                                                and 0 <= i + dep_i < self.board_width 
-                                                and 0 <= j + dep_j < self.board_height
-                                                and self.board_matrix[i + dep_i, j + dep_j] != col]
-        for adj in adjacents:
-            if self.player_matrix[adj] == 1:
-                return False
-        return True        
+        return self.engine.can_place_queen(i, j)
         
     def place_queen(self, i, j):
+        self.engine.place_queen(i, j)
+        self.check_victory()
+    
+    def remove_queen(self, i, j):
+        self.engine.remove_queen(i, j)
+        self.check_victory()
+        
+    def place_noqueen(self, i, j):
+        self.engine.place_noqueen(i, j)
+        
+    def remove_noqueen(self, i, j):
+        self.engine.remove_noqueen(i, j)
+        
+    def queen_placed(self, i, j):
         if self.terminal_debug:
             print("Queen placed")
-        self.player_matrix[i, j] = 1
-        self.colors_filled[self.board_matrix[i, j]].append((i, j))
-        self.queens_placed += 1
         left, top, cell_width, cell_height = self.get_subcell_coord(i, j)
-        queen = pg.image.load("assets/queen.png")
-        queen = pg.transform.scale(queen, (cell_width, cell_height))
-        self.screen.blit(queen, (left, top))
-        self.check_victory()
-        self.update_screen()
+        self.screen.blit(self.get_queen_sprite(cell_width, cell_height), (left, top))
+        self.mark_dirty(i, j)
     
-    def remove_queen(self, i, j):
+    def queen_removed(self, i, j):
         if self.terminal_debug:
             print("Queen removed")
-        self.player_matrix[i, j] = 0
-        self.colors_filled[self.board_matrix[i, j]].remove((i, j))
-        self.queens_placed -= 1
         pg.draw.rect(self.screen, self.get_col(self.board_matrix[i, j]), self.subcells[i, j])
-        self.check_victory()
-        self.update_screen()
+        self.mark_dirty(i, j)
         
-    def place_noqueen(self, i, j):
-        self.player_matrix[i, j] = 2
+    def noqueen_placed(self, i, j):
         left, top, cell_width, cell_height = self.get_subcell_coord(i, j)
-        left, top, cell_width, cell_height = left + self.cross_line_size, top + self.cross_line_size, cell_width - 2 * self.cross_line_size, cell_height - 2 * self.cross_line_size
-        pg.draw.line(self.screen, (0, 0, 0), (left, top), (left + cell_width, top + cell_height), self.cross_line_size)
-        pg.draw.line(self.screen, (0, 0, 0), (left, top + cell_height), (left + cell_width, top), self.cross_line_size)
-        self.update_screen()
+        self.screen.blit(self.get_cross_sprite(cell_width, cell_height), (left, top))
+        self.mark_dirty(i, j)
         
-    def remove_noqueen(self, i, j):
-        self.player_matrix[i, j] = 0
+    def noqueen_removed(self, i, j):
         pg.draw.rect(self.screen, self.get_col(self.board_matrix[i, j]), self.subcells[i, j])
-        self.update_screen()
\ No newline at end of file
+        self.mark_dirty(i, j)
@@ -0,0 +1,110 @@
+EMPTY = 0
+QUEEN = 1
+NOQUEEN = 2
+
+
+class BoardEngine:
+    # rule state of a queens board, no pygame: an optional observer gets
+    # queen_placed / queen_removed / noqueen_placed / noqueen_removed calls
+
+    def __init__(self, board_matrix, observer=None):
+        self.board_matrix: list[list[int]] = [[int(value) for value in row] for row in board_matrix]
+        self.board_width: int = len(self.board_matrix)
+        self.board_height: int = len(self.board_matrix[0])
+        self.n_queen: int = len({value for row in self.board_matrix for value in row})
+        self.observer = observer
+
+        self.player_matrix: list[list[int]]
+        self.colors_filled: list[list[tuple[int, int]]]
+        self.queens_placed: int
+        self.row_queens: list[int]
+        self.col_queens: list[int]
+        self.row_color_queens: dict[tuple[int, int], int]
+        self.col_color_queens: dict[tuple[int, int], int]
+        self.rows_filled: int
+        self.cols_filled: int
+        self.colors_done: int
+
+        self.reset()
+
+    def reset(self):
+        self.player_matrix = [[EMPTY] * self.board_height for _ in range(self.board_width)]
+        self.queens_placed = 0
+        self.colors_filled = [[] for _ in range(self.n_queen)]
+        self.row_queens = [0] * self.board_width
+        self.col_queens = [0] * self.board_height
+        self.row_color_queens = {}
+        self.col_color_queens = {}
+        self.rows_filled = 0
+        self.cols_filled = 0
+        self.colors_done = 0
+
+    def notify(self, event, i, j):
+        if self.observer is not None:
+            getattr(self.observer, event)(i, j)
+
+    def victory(self, debug=False):
+        if self.n_queen != self.queens_placed:
+            if debug:
+                print(f"Wrong number of queens: {self.n_queen} not equal to {self.queens_placed}")
+            return False
+        if self.colors_done != self.n_queen:
+            if debug:
+                print(f"No queen for all colors: ", all(map(len, self.colors_filled)), map(len, self.colors_filled))
+            return False
+        if self.rows_filled != self.board_width:
+            if debug:
+                print(f"No queen in line {self.row_queens.index(0)}")
+            return False
+        if self.cols_filled != self.board_height:
+            if debug:
+                print(f"No queen in column {self.col_queens.index(0)}")
+            return False
+        return True
+
+    def can_place_queen(self, i, j):
+        col = self.board_matrix[i][j]
+        if self.row_queens[i] != self.row_color_queens.get((i, col), 0):
+            return False
+        if self.col_queens[j] != self.col_color_queens.get((j, col), 0):
+            return False
+        for adj_i in range(max(i - 1, 0), min(i + 2, self.board_width)):
+            for adj_j in range(max(j - 1, 0), min(j + 2, self.board_height)):
+                if self.player_matrix[adj_i][adj_j] == QUEEN and self.board_matrix[adj_i][adj_j] != col:
+                    return False
+        return True
+
+    def count_queen(self, i, j, step):
+        col = self.board_matrix[i][j]
+        self.rows_filled += (self.row_queens[i] + step > 0) - (self.row_queens[i] > 0)
+        self.cols_filled += (self.col_queens[j] + step > 0) - (self.col_queens[j] > 0)
+        self.row_queens[i] += step
+        self.col_queens[j] += step
+        self.row_color_queens[i, col] = self.row_color_queens.get((i, col), 0) + step
+        self.col_color_queens[j, col] = self.col_color_queens.get((j, col), 0) + step
+
+    def place_queen(self, i, j):
+        col = self.board_matrix[i][j]
+        self.player_matrix[i][j] = QUEEN
+        self.colors_filled[col].append((i, j))
+        self.colors_done += len(self.colors_filled[col]) == 1
+        self.count_queen(i, j, 1)
+        self.queens_placed += 1
+        self.notify("queen_placed", i, j)
+
+    def remove_queen(self, i, j):
+        col = self.board_matrix[i][j]
+        self.player_matrix[i][j] = EMPTY
+        self.colors_filled[col].remove((i, j))
+        self.colors_done -= len(self.colors_filled[col]) == 0
+        self.count_queen(i, j, -1)
+        self.queens_placed -= 1
+        self.notify("queen_removed", i, j)
+
+    def place_noqueen(self, i, j):
+        self.player_matrix[i][j] = NOQUEEN
+        self.notify("noqueen_placed", i, j)
+
+    def remove_noqueen(self, i, j):
+        self.player_matrix[i][j] = EMPTY
+        self.notify("noqueen_removed", i, j)
@@ -0,0 +1,88 @@
+import argparse
+import json
+import os
+import numpy as np
+import queen_solver
+import tango_solver
+from tango_templates import EMPTY, EQUAL, CROSS, TemplateClassifier, patch_vectors
+
+# labels live next to each screenshot (grid.png -> grid.json) as
+# {"grid": 6x6 of 0/1/2, "links": [[row, col, row2, col2, is_cross], ...]},
+# the same content process_grid_image returns
+
+def label_file(screenshot):
+	return os.path.splitext(screenshot)[0] + '.json'
+
+def write_labels(path, grid_symbole, links):
+	pairs = [[*cell, *other, is_cross] for cell, cell_links in links.items() for other, is_cross in cell_links]
+	with open(path, 'w') as f:
+		json.dump({'grid': grid_symbole.tolist(), 'links': pairs}, f, indent=1)
+
+def grid_to_kinds(grid_symbole, links, count):
+	# the inverse of tango_solver.kinds_to_grid
+	kinds = np.full(count, EMPTY)
+	kinds[:36] = np.asarray(grid_symbole).reshape(-1)
+	for (row, col), cell_links in links.items():
+		for (row2, col2), is_cross in cell_links:
+			if row == row2:
+				index = 36 + (min(col, col2) * 6 + row)
+			else:
+				index = 66 + (min(row, row2) * 6 + col)
+			kinds[index] = CROSS if is_cross else EQUAL
+	return kinds
+
+def read_kinds(path, count):
+	with open(path, 'r') as f:
+		labels = json.load(f)
+	links = {}
+	for row, col, row2, col2, is_cross in labels['links']:
+		links.setdefault((row, col), []).append(((row2, col2), is_cross))
+	return grid_to_kinds(labels['grid'], links, count)
+
+def main():
+	parser = argparse.ArgumentParser(description="Build the Tango symbol templates from hand-checked, labelled screenshots")
+	parser.add_argument('screenshots', nargs='+')
+	parser.add_argument('-o', '--output', default=tango_solver.templates_file)
+	parser.add_argument('--write-labels', action='store_true', help="draft labels with the per-patch detector for screenshots that have none; every draft must be checked by hand, templates built from unchecked drafts only copy that detector")
+	args = parser.parse_args()
+
+	vectors, kinds, groups, detected = [], [], [], []
+	for screenshot in args.screenshots:
+		image = queen_solver.load_screenshot(screenshot)
+		grid_image = tango_solver.detect_grid(image)[0] if image is not None else None
+		if grid_image is None:
+			print(f"{screenshot}: no grid found")
+			continue
+		regions = tango_solver.patch_regions(grid_image)
+		labels = label_file(screenshot)
+		if args.write_labels:
+			if not os.path.exists(labels):
+				write_labels(labels, *tango_solver.process_grid_image_per_patch(grid_image))
+				print(f"{screenshot}: wrote {labels}, check it by hand")
+			continue
+		if not os.path.exists(labels):
+			print(f"{screenshot}: no {labels}, skipped")
+			continue
+		vectors.append(patch_vectors(tango_solver.grid_binary(grid_image), regions))
+		kinds.append(read_kinds(labels, len(regions)))
+		groups.append(tango_solver.region_groups(regions))
+		detected.append(grid_to_kinds(*tango_solver.process_grid_image_per_patch(grid_image), len(regions)))
+	if args.write_labels:
+		return
+	if not vectors:
+		print("No labelled screenshots.")
+		return
+	classifier = TemplateClassifier.from_examples(np.concatenate(vectors), np.concatenate(kinds), np.concatenate(groups))
+	classifier.save(args.output)
+	print(f"{len(classifier.kinds)} templates from {len(vectors)} screenshots written to {args.output}")
+	# agreement on the training screenshots: a label the per-patch detector
+	# disagrees with is either a detector miss or a label to check again
+	predicted = np.concatenate([classifier.classify(v, g) for v, g in zip(vectors, groups)])
+	labelled = np.concatenate(kinds)
+	per_patch = np.concatenate(detected)
+	print(f"templates vs labels:    {(predicted == labelled).mean():.1%} of patches")
+	print(f"per-patch vs labels:    {(per_patch == labelled).mean():.1%} of patches")
+	print(f"templates vs per-patch: {(predicted == per_patch).mean():.1%} of patches")
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,164 @@
+import threading
+import time
+import traceback
+import numpy as np
+
+class RegionTracker:
+	# grabs the whole desktop until a grid is found, then only the grid plus
+	# a margin; frame coordinates are always returned in full-screen pixels
+
+	def __init__(self, margin=40):
+		self.monitor = None
+		self.margin = margin
+		self.region = None
+		self.scale = None
+
+	def grab(self, sct):
+		# mss handles are per thread, so the caller passes its own
+		if self.monitor is None:
+			self.monitor = sct.monitors[0]
+		region = self.region or self.monitor
+		frame = np.array(sct.grab(region))
+		if self.scale is None:
+			# mss regions are in screen points, frames in pixels (2x on retina)
+			self.scale = frame.shape[1] / region['width']
+		offset_x = round((region['left'] - self.monitor['left']) * self.scale)
+		offset_y = round((region['top'] - self.monitor['top']) * self.scale)
+		return frame, (offset_x, offset_y)
+
+	def track(self, x, y, w, h):
+		monitor = self.monitor
+		left = max(monitor['left'], monitor['left'] + int(x / self.scale) - self.margin)
+		top = max(monitor['top'], monitor['top'] + int(y / self.scale) - self.margin)
+		right = min(monitor['left'] + monitor['width'], monitor['left'] + int((x + w) / self.scale) + 1 + self.margin)
+		bottom = min(monitor['top'] + monitor['height'], monitor['top'] + int((y + h) / self.scale) + 1 + self.margin)
+		self.region = {'left': left, 'top': top, 'width': right - left, 'height': bottom - top}
+
+	def lose(self):
+		self.region = None
+
+class FrameChangeDetector:
+	# mean absolute difference of a strided thumbnail against the last frame
+
+	def __init__(self, step=8, threshold=1.0):
+		self.step = step
+		self.threshold = threshold
+		self.previous = None
+		self.still_frames = 0
+
+	def changed(self, frame):
+		thumbnail = frame[::self.step, ::self.step, :3].astype(np.int16)
+		previous = self.previous
+		self.previous = thumbnail
+		if previous is not None and previous.shape == thumbnail.shape and np.abs(thumbnail - previous).mean() <= self.threshold:
+			self.still_frames += 1
+			return False
+		self.still_frames = 0
+		return True
+
+	def reset(self):
+		self.previous = None
+		self.still_frames = 0
+
+class FpsCounter:
+	# silent unless enabled, so the capture loop prints nothing by default
+
+	def __init__(self, name, interval=2.0, enabled=False):
+		self.name = name
+		self.interval = interval
+		self.enabled = enabled
+		self.reset()
+
+	def toggle(self):
+		self.enabled = not self.enabled
+		self.reset()
+
+	def reset(self):
+		self.frames = 0
+		self.skipped = 0
+		self.pixels = 0
+		self.start = time.perf_counter()
+		self.cpu_start = time.process_time()
+
+	def tick(self, frame, skipped=False):
+		if not self.enabled:
+			return
+		self.frames += 1
+		self.skipped += skipped
+		self.pixels += frame.shape[0] * frame.shape[1]
+		elapsed = time.perf_counter() - self.start
+		if elapsed >= self.interval:
+			cpu = (time.process_time() - self.cpu_start) / elapsed
+			print(f"{self.name}: {self.frames / elapsed:.1f} fps, {self.pixels / self.frames / 1e6:.2f} Mpx/frame, "
+				f"{self.skipped / self.frames:.0%} unchanged, {cpu:.0%} cpu")
+			self.reset()
+
+class LatestItem:
+	# one-slot mailbox: a new item replaces the one nobody has taken yet
+
+	def __init__(self):
+		self.condition = threading.Condition()
+		self.item = None
+		self.dropped = 0
+
+	def put(self, item):
+		with self.condition:
+			if self.item is not None:
+				self.dropped += 1
+			self.item = item
+			self.condition.notify()
+
+	def get(self, timeout=None):
+		with self.condition:
+			self.condition.wait_for(lambda: self.item is not None, timeout)
+			item, self.item = self.item, None
+			return item
+
+def run_stage(stage, *args):
+	# a failing frame is logged and dropped instead of silently ending the
+	# stage's thread
+	try:
+		return stage(*args)
+	except Exception:
+		traceback.print_exc()
+		return None
+
+def run_pipeline(frames, vision, act, running):
+	# frames() runs in the capture thread and yields (captured_at, frame)
+	# pairs, vision(captured_at, frame) returns a result for act or None;
+	# each stage only ever sees the newest item of the previous one. The
+	# pipeline stops when running() turns false or the capture fails
+	captured = LatestItem()
+	results = LatestItem()
+	capture_failed = threading.Event()
+
+	def alive():
+		return running() and not capture_failed.is_set()
+
+	def capture_loop():
+		try:
+			for item in frames():
+				captured.put(item)
+		except Exception:
+			traceback.print_exc()
+			capture_failed.set()
+
+	def vision_loop():
+		while alive():
+			item = captured.get(timeout=0.1)
+			if item is not None:
+				result = run_stage(vision, *item)
+				if result is not None:
+					results.put(result)
+
+	def act_loop():
+		while alive():
+			result = results.get(timeout=0.1)
+			if result is not None:
+				run_stage(act, result)
+
+	threads = [threading.Thread(target=loop, daemon=True) for loop in (capture_loop, vision_loop, act_loop)]
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join()
@@ -1,7 +1,7 @@
 from board import Board
-import numpy as np
 import pygame as pg
-import random as rd
+from queen_generator import PuzzlePool
+import timing
 
 
 class Game:
@@ -12,6 +12,7 @@ class Game:
         self.screen = pg.display.set_mode((self.width, self.height))
         
         self.shape_game = game_shape
+        self.puzzles = PuzzlePool(game_shape[0])
         self.running = False
         
     def start(self):
@@ -20,6 +21,7 @@ class Game:
         
         while self.running:
             self.interact()
+        self.puzzles.close()
         
     def new_board(self):
         self.create_board_matrix()
@@ -30,24 +32,7 @@ class Game:
         print("Victory !")
         
     def create_board_matrix(self):
-        self.board_matrix = rd.choice([np.array([[0,0,0,0,1,1,1,1],
-                                [0,0,1,1,1,2,2,3],
-                                [0,0,5,0,2,2,2,3],
-                                [4,5,5,0,3,3,3,3],
-                                [4,5,5,0,6,0,0,0],
-                                [5,5,5,6,6,6,0,0],
-                                [5,5,6,6,6,7,0,7],
-                                [5,5,6,0,6,7,7,7],
-                                ]), 
-                                np.array([[0,0,1,1,1,0,2,0],
-                                [0,1,1,1,2,2,2,0],
-                                [1,1,3,4,2,2,0,0],
-                                [5,5,3,4,4,2,2,0],
-                                [5,5,4,4,4,2,2,0],
-                                [5,5,4,4,4,2,2,6],
-                                [5,5,7,4,7,6,0,6],
-                                [5,5,7,7,7,6,6,6],
-                                ])])
+        self.board_matrix = self.puzzles.next()
         
     def interact(self):
         for event in pg.event.get():
@@ -69,7 +54,13 @@ class Game:
                     print(self.board.victory(debug=True))
                 elif event.key == pg.K_o:
                     self.board.create_grid()
-                    self.board.update_screen()
                 elif event.key == pg.K_p:
                     self.board.display()
-                    self.board.update_screen()
\ No newline at end of file
+                elif event.key == pg.K_f:
+                    self.board.print_frame_times()
+                elif event.key == pg.K_t:
+                    timing.enable(not timing.enabled)
+                    print(f"Timing: {timing.enabled}")
+                elif event.key == pg.K_h:
+                    timing.report()
+        self.board.update_screen()
\ No newline at end of file
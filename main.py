@@ -1,5 +1,6 @@
 from game import Game
 
 
-game = Game()
-game.start()
\ No newline at end of file
+if __name__ == "__main__":
+    game = Game()
+    game.start()
@@ -0,0 +1,118 @@
+import random
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+import numpy as np
+from queen_search import iter_solutions
+
+NEIGHBOURS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+def random_solution(n, rng):
+	solution = [0] * n
+
+	def place(row, used):
+		if row == n:
+			return True
+		cols = [col for col in range(n) if not used & (1 << col) and (row == 0 or abs(solution[row - 1] - col) > 1)]
+		rng.shuffle(cols)
+		for col in cols:
+			solution[row] = col
+			if place(row + 1, used | (1 << col)):
+				return True
+		return False
+
+	place(0, 0)
+	return solution
+
+def grow_paving(solution, rng):
+	# one region per queen, grown outwards until the board is covered
+	n = len(solution)
+	paving = [[-1] * n for _ in range(n)]
+	frontier = []
+	for row, col in enumerate(solution):
+		paving[row][col] = row
+		frontier.append((row, col))
+	while frontier:
+		row, col = frontier.pop(rng.randrange(len(frontier)))
+		for d_row, d_col in NEIGHBOURS:
+			r, c = row + d_row, col + d_col
+			if 0 <= r < n and 0 <= c < n and paving[r][c] == -1:
+				paving[r][c] = paving[row][col]
+				frontier.append((r, c))
+	return paving
+
+def still_connected(paving, row, col):
+	# would the region of (row, col) stay in one piece without that cell
+	n = len(paving)
+	region = paving[row][col]
+	cells = {(r, c) for r in range(n) for c in range(n) if paving[r][c] == region}
+	cells.discard((row, col))
+	if not cells:
+		return False
+	stack = [next(iter(cells))]
+	seen = set(stack)
+	while stack:
+		r, c = stack.pop()
+		for d_row, d_col in NEIGHBOURS:
+			cell = (r + d_row, c + d_col)
+			if cell in cells and cell not in seen:
+				seen.add(cell)
+				stack.append(cell)
+	return len(seen) == len(cells)
+
+def generate_puzzle(n, seed=None, max_repairs=None):
+	rng = random.Random(seed)
+	max_repairs = max_repairs or 4 * n
+	while True:
+		solution = random_solution(n, rng)
+		paving = grow_paving(solution, rng)
+		for _ in range(max_repairs):
+			# two solutions are enough to find one that is not ours
+			other = next((s for s in islice(iter_solutions(paving), 2) if s != solution), None)
+			if other is None:
+				return np.array(paving)
+			# hand one of the other solution's queen cells to a neighbouring
+			# region: ours is untouched, the other loses a region
+			moves = []
+			for row in range(n):
+				col = other[row]
+				if col == solution[row]:
+					continue
+				for d_row, d_col in NEIGHBOURS:
+					r, c = row + d_row, col + d_col
+					if 0 <= r < n and 0 <= c < n and paving[r][c] != paving[row][col]:
+						moves.append((row, col, paving[r][c]))
+			rng.shuffle(moves)
+			for row, col, region in moves:
+				if still_connected(paving, row, col):
+					paving[row][col] = region
+					break
+			else:
+				break
+
+class PuzzlePool:
+
+	def __init__(self, n, size=4, workers=None):
+		self.n = n
+		self.size = size
+		self.executor = ProcessPoolExecutor(max_workers=workers)
+		self.pending = deque(self.executor.submit(generate_puzzle, n) for _ in range(size))
+
+	def next(self):
+		# prefer a puzzle that is already done, fall back to the oldest one
+		ready = next((future for future in self.pending if future.done()), self.pending[0])
+		self.pending.remove(ready)
+		self.pending.append(self.executor.submit(generate_puzzle, self.n))
+		return ready.result()
+
+	def close(self):
+		self.executor.shutdown(wait=False, cancel_futures=True)
+
+def puzzles_per_second(n, duration=5.0, seed=0):
+	start = time.perf_counter()
+	count = 0
+	while time.perf_counter() - start < duration:
+		generate_puzzle(n, seed=seed + count)
+		count += 1
+	return count / (time.perf_counter() - start)
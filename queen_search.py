@@ -0,0 +1,93 @@
+from itertools import islice
+
+def build_masks(paving):
+	# every cell is one bit (row * n + col) of a python int
+	n = len(paving)
+	labels = {}
+	region_masks = []
+	for row in range(n):
+		for col in range(n):
+			label = paving[row][col]
+			if label not in labels:
+				labels[label] = len(region_masks)
+				region_masks.append(0)
+			region_masks[labels[label]] |= 1 << (row * n + col)
+	row_masks = [((1 << n) - 1) << (row * n) for row in range(n)]
+	col_masks = [sum(1 << (row * n + col) for row in range(n)) for col in range(n)]
+	block_masks = []
+	for row in range(n):
+		for col in range(n):
+			mask = row_masks[row] | col_masks[col]
+			for d_row in (-1, 0, 1):
+				for d_col in (-1, 0, 1):
+					if 0 <= row + d_row < n and 0 <= col + d_col < n:
+						mask |= 1 << ((row + d_row) * n + col + d_col)
+			block_masks.append(mask)
+	return region_masks, row_masks, col_masks, block_masks
+
+def has_matching(regions, lines, free):
+	# each remaining region needs its own row (or column): if no perfect
+	# matching exists the branch is dead even though every region has a cell
+	edges = []
+	for region in regions:
+		cells = free & region
+		edges.append(sum(1 << i for i, line in enumerate(lines) if cells & line))
+	matched = {}
+
+	def augment(i, seen):
+		candidates = edges[i] & ~seen[0]
+		while candidates:
+			bit = candidates & -candidates
+			candidates ^= bit
+			seen[0] |= bit
+			if bit not in matched or augment(matched[bit], seen):
+				matched[bit] = i
+				return True
+		return False
+
+	return all(augment(i, [0]) for i in range(len(edges)))
+
+def iter_solutions(paving):
+	n = len(paving)
+	region_masks, row_masks, col_masks, block_masks = build_masks(paving)
+	if len(region_masks) != n:
+		return
+	solution = [0] * n
+
+	def place(free, regions, rows, cols):
+		if not regions:
+			yield list(solution)
+			return
+		# every region, row and column needs exactly one queen: branch on
+		# the one with the fewest free cells left
+		best_cells, best_count = 0, n * n + 1
+		for unit in regions + rows + cols:
+			cells = free & unit
+			count = cells.bit_count()
+			if count < best_count:
+				best_cells, best_count = cells, count
+				if count == 0:
+					return
+		if not has_matching(regions, rows, free) or not has_matching(regions, cols, free):
+			return
+		while best_cells:
+			bit = best_cells & -best_cells
+			best_cells ^= bit
+			cell = bit.bit_length() - 1
+			row, col = divmod(cell, n)
+			solution[row] = col
+			yield from place(
+				free & ~block_masks[cell],
+				[region for region in regions if not region & bit],
+				[line for line in rows if not line & bit],
+				[line for line in cols if not line & bit],
+			)
+
+	yield from place((1 << (n * n)) - 1, region_masks, row_masks, col_masks)
+
+def count_solutions(paving, limit=None):
+	# stops after `limit` solutions: limit=2 is enough to check uniqueness
+	return sum(1 for _ in islice(iter_solutions(paving), limit))
+
+def has_unique_solution(paving):
+	return count_solutions(paving, limit=2) == 1
@@ -1,13 +1,25 @@
 import cv2
 import numpy as np
-import mss
 from collections import defaultdict
-import threading
-from pynput import keyboard
-import pyautogui
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from actuate import clickers
+import timing
+from runtime import PuzzleSolver, Runtime
+from queen_search import iter_solutions, count_solutions
 
 have_highdpi = True
 double_click = True
+clicker_name = 'pynput'
+timings_file = None
+stable_frames = 1
 
 def solution_valid_for_paving(paving, solution):
 	queens_color = [paving[queen_x, queen_y] for queen_x, queen_y in enumerate(solution)]
@@ -15,20 +27,160 @@ def solution_valid_for_paving(paving, solution):
 		return False
 	return True
 
-def solve(paving):
-	n = len(paving)
-	try:
+solution_tables = {}
+
+def generate_solutions(n):
+	# every permutation with no two queens on touching diagonals, in
+	# lexicographic order, one byte per row
+	solutions = []
+	solution = [0] * n
+
+	def place(row, used):
+		if row == n:
+			solutions.append(list(solution))
+			return
+		for col in range(n):
+			if used & (1 << col):
+				continue
+			if row > 0 and abs(solution[row - 1] - col) <= 1:
+				continue
+			solution[row] = col
+			place(row + 1, used | (1 << col))
+
+	place(0, 0)
+	return np.array(solutions, dtype=np.uint8).reshape(-1, n)
+
+def save_solution_table(n, solutions):
+	np.ascontiguousarray(solutions, dtype=np.uint8).tofile(f'solution_{n}.bin')
+
+def convert_solution_files(sizes=range(5, 10)):
+	for n in sizes:
 		with open(f'solution_{n}.txt', 'r') as f:
 			solutions = [[int(x) for x in line.strip().split(',')] for line in f]
-	except FileNotFoundError:
+		save_solution_table(n, np.array(solutions, dtype=np.uint8).reshape(-1, n))
+
+def load_solution_table(n):
+	if n not in solution_tables:
+		try:
+			solution_tables[n] = np.memmap(f'solution_{n}.bin', dtype=np.uint8, mode='r').reshape(-1, n)
+		except FileNotFoundError:
+			return None
+	return solution_tables[n]
+
+def filter_solutions(paving, solutions, first=False, chunk_size=4096):
+	paving = np.asarray(paving)
+	n = len(paving)
+	labels, regions = np.unique(paving, return_inverse=True)
+	if len(labels) != n:
+		return None if first else solutions[:0]
+	# one bit per region: a permutation fits when its queens cover every bit
+	region_bits = np.left_shift(1, regions.reshape(n, n)).astype(np.int64)
+	full = (1 << n) - 1
+	step = chunk_size if first else max(len(solutions), 1)
+	matches = []
+	for start in range(0, len(solutions), step):
+		chunk = solutions[start:start + step]
+		covered = np.bitwise_or.reduce(region_bits[np.arange(n), chunk], axis=1)
+		found = chunk[covered == full]
+		if first and len(found):
+			return found[0]
+		matches.append(found)
+	if first:
+		return None
+	return np.concatenate(matches) if matches else solutions[:0]
+
+def solve_with_table(paving):
+	n = len(paving)
+	solutions = load_solution_table(n)
+	if solutions is None:
 		print(f"Solutions for {n}x{n} not found")
 		return 0
-	for solution in solutions:
-		if solution_valid_for_paving(paving, solution):
-			return solution
-	print(f"No valid solution found for {n}x{n}")
-	return None
-
+	solution = filter_solutions(paving, solutions, first=True)
+	if solution is None:
+		print(f"No valid solution found for {n}x{n}")
+		return None
+	return solution.tolist()
+
+solution_indexes = {}
+
+def build_solution_index(solutions):
+	# one packed bitset of solution ids per cell (row * n + col)
+	count, n = solutions.shape
+	cells = np.zeros((n * n, count), dtype=bool)
+	cells[np.arange(n) * n + solutions, np.arange(count)[:, None]] = True
+	return np.packbits(cells, axis=1)
+
+def index_matches_table(index, solutions, n):
+	# every solution has one queen in row 0, so the bits of its n cells
+	# count the records the index was built from
+	return index.shape == (n * n, (len(solutions) + 7) // 8) and np.unpackbits(index[:n]).sum() == len(solutions)
+
+def load_solution_index(n):
+	if n not in solution_indexes:
+		solutions = load_solution_table(n)
+		if solutions is None:
+			return None
+		path = f'solution_{n}_index.npy'
+		index = None
+		if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(f'solution_{n}.bin'):
+			index = np.load(path, mmap_mode='r')
+			if not index_matches_table(index, solutions, n):
+				index = None
+		if index is None:
+			np.save(path, build_solution_index(solutions))
+			index = np.load(path, mmap_mode='r')
+		solution_indexes[n] = index
+	return solution_indexes[n]
+
+def solve_with_index(paving, first=True):
+	paving = np.asarray(paving)
+	n = len(paving)
+	index = load_solution_index(n)
+	if index is None:
+		print(f"Solutions for {n}x{n} not found")
+		return 0
+	labels, regions = np.unique(paving, return_inverse=True)
+	if len(labels) != n:
+		return None if first else []
+	regions = regions.reshape(-1)
+	cells_by_region = sorted((np.flatnonzero(regions == region) for region in range(n)), key=len)
+	# n queens over n regions: a solution touching every region has exactly
+	# one queen in each, so AND the per-region unions, smallest region first
+	candidates = None
+	for cells in cells_by_region:
+		region_bits = np.bitwise_or.reduce(index[cells], axis=0)
+		candidates = region_bits if candidates is None else candidates & region_bits
+		if not candidates.any():
+			return None if first else []
+	solutions = load_solution_table(n)
+	ids = np.flatnonzero(np.unpackbits(candidates)[:len(solutions)])
+	if first:
+		return solutions[ids[0]].tolist()
+	return solutions[ids].tolist()
+
+@timing.timed('queens.solve')
+def solve(paving):
+	n = len(paving)
+	solution = next(iter_solutions(paving), None)
+	if solution is None:
+		print(f"No valid solution found for {n}x{n}")
+	return solution
+
+def load_paving(filename):
+	with open(filename, 'r') as f:
+		rows = [line.replace(',', ' ').split() for line in f]
+	return np.array([[int(x) for x in row] for row in rows if row], dtype=int)
+
+def count_main(filename, limit=None):
+	paving = load_paving(filename)
+	start = time.perf_counter()
+	count = count_solutions(paving, limit)
+	elapsed = time.perf_counter() - start
+	bound = "" if limit is None or count < limit else "at least "
+	print(f"{len(paving)}x{len(paving)}: {bound}{count} solution(s) in {elapsed * 1e3:.3f} ms")
+	return count
+
+@timing.timed('queens.detect_grid')
 def detect_grid(image):
 	gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
 	blurred = cv2.GaussianBlur(gray, (5, 5), 0)
@@ -74,35 +226,61 @@ def align_squares(squares, tolerance=10):
 
 	return aligned_squares
 
-def extract_cells(grid):
-	gray = cv2.cvtColor(grid, cv2.COLOR_BGR2GRAY)
-	blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-	_, binary = cv2.threshold(gray, 10, 255, cv2.THRESH_BINARY_INV)
-	contours, _ = cv2.findContours(binary, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+class DebugImages:
+
+	def __init__(self, dump_dir=None):
+		self.images = {}
+		self.dump_dir = dump_dir
+
+	def add(self, name, image):
+		self.images[name] = image
+		if self.dump_dir is not None:
+			os.makedirs(self.dump_dir, exist_ok=True)
+			cv2.imwrite(os.path.join(self.dump_dir, f"{name}.png"), image)
+
+debug_dir = None
+
+def find_lines(profile, min_fill=0.5):
+	# runs of rows (or columns) that are mostly grid-line pixels
+	on = np.flatnonzero(profile >= min_fill)
+	if len(on) == 0:
+		return []
+	breaks = np.flatnonzero(np.diff(on) > 1)
+	starts = on[np.r_[0, breaks + 1]]
+	ends = on[np.r_[breaks, len(on) - 1]]
+	return list(zip(starts.tolist(), ends.tolist()))
+
+def lattice_spans(lines, tolerance=0.2):
+	# the gaps between consecutive lines, if they are evenly spaced
+	spans = [(end + 1, start) for (_, end), (start, _) in zip(lines, lines[1:])]
+	sizes = np.array([stop - start for start, stop in spans])
+	if len(sizes) == 0 or (sizes <= 0).any():
+		return None
+	median = np.median(sizes)
+	if (np.abs(sizes - median) > tolerance * median).any():
+		return None
+	return spans
 
-	grid = cv2.cvtColor(grid, cv2.COLOR_BGRA2BGR)
-	contours_image = grid.copy()
-	cv2.drawContours(contours_image, contours, -1, (0, 255, 0, 255), 3)
-	cv2.imwrite("original.png", grid)
-	cv2.imwrite("blurred.png", blurred)
-	cv2.imwrite("binary.png", binary)
-	cv2.imwrite("contours.png", contours_image)
+def extract_cells_lattice(binary):
+	rows = lattice_spans(find_lines(binary.mean(axis=1) / 255))
+	cols = lattice_spans(find_lines(binary.mean(axis=0) / 255))
+	if rows is None or cols is None or len(rows) != len(cols):
+		return []
+	return [(x0, y0, x1 - x0, y1 - y0) for y0, y1 in rows for x0, x1 in cols]
+
+def extract_cells_contours(binary):
+	contours, _ = cv2.findContours(binary, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
 	# find all squares in the image
 	squares = []
 	for contour in contours:
 		epsilon = 0.05 * cv2.arcLength(contour, True)
 		approx = cv2.approxPolyDP(contour, epsilon, True)
-
-		print(len(approx))
-		if len(approx) == 4:
-			print(cv2.contourArea(approx))
 		if len(approx) == 4 and cv2.contourArea(approx) > 50:
 			x, y, w, h = cv2.boundingRect(approx)
 			aspect_ratio = float(w) / h
 			if 0.9 <= aspect_ratio <= 1.1:  # Square aspect ratio
 				squares.append((x, y, w, h))
 
-	print(f"Found {len(squares)} squares")
 	# Filter squares based on area
 	if len(squares) > 0:
 		areas = [w * h for _, _, w, h in squares]
@@ -132,33 +310,62 @@ def extract_cells(grid):
 	squares = align_squares(squares)
 	return squares
 
-def extract_colors(grid, squares):
+@timing.timed('queens.extract_cells')
+def extract_cells(grid, debug=None):
+	gray = cv2.cvtColor(grid, cv2.COLOR_BGR2GRAY)
+	_, binary = cv2.threshold(gray, 10, 255, cv2.THRESH_BINARY_INV)
+
+	squares = extract_cells_lattice(binary)
+	if not squares:
+		squares = extract_cells_contours(binary)
+
+	if debug is not None:
+		grid = cv2.cvtColor(grid, cv2.COLOR_BGRA2BGR)
+		cells_image = grid.copy()
+		for x, y, w, h in squares:
+			cv2.rectangle(cells_image, (x, y), (x + w - 1, y + h - 1), (0, 255, 0), 1)
+		debug.add("original", grid)
+		debug.add("blurred", cv2.GaussianBlur(gray, (5, 5), 0))
+		debug.add("binary", binary)
+		debug.add("cells", cells_image)
+	return squares
+
+def sample_centers(grid, squares, margin=0.4):
+	# mean colour of the centre of every square from one integral image
+	boxes = np.array(squares, dtype=np.int64).reshape(-1, 4)
+	x, y, w, h = boxes.T
+	x0 = (x + margin * w).astype(np.int64)
+	x1 = (x + (1 - margin) * w).astype(np.int64)
+	y0 = (y + margin * h).astype(np.int64)
+	y1 = (y + (1 - margin) * h).astype(np.int64)
+	sums = cv2.integral(np.ascontiguousarray(grid[:, :, :3]))
+	totals = sums[y1, x1] - sums[y0, x1] - sums[y1, x0] + sums[y0, x0]
+	areas = np.maximum((x1 - x0) * (y1 - y0), 1)
+	return totals / areas[:, None]
+
+@timing.timed('queens.extract_colors')
+def extract_colors(grid, squares, tolerance=10):
 	color_map = defaultdict(list)
 	colors_detected = []
-
-	for square_idx, (x, y, w, h) in enumerate(squares):
-		margin = 0.4
-		x_center_start = int(x + margin * w)
-		x_center_end = int(x + (1 - margin) * w)
-		y_center_start = int(y + margin * h)
-		y_center_end = int(y + (1 - margin) * h)
-
-		center_region = grid[y_center_start:y_center_end, x_center_start:x_center_end]
-
-		avg_color = cv2.mean(center_region)[:3]
-		matched = False
-		for idx, ref_color in enumerate(colors_detected):
-			if np.linalg.norm(np.array(avg_color) - np.array(ref_color)) < 1:
-				color_map[idx].append((square_idx, (x, y, w, h)))
-				matched = True
-				break
-		if not matched:
-			colors_detected.append(avg_color)
-			color_map[len(colors_detected) - 1].append((square_idx, (x, y, w, h)))
+	if len(squares) == 0:
+		return color_map, colors_detected
+
+	averages = sample_centers(grid, squares)
+	lab = cv2.cvtColor(np.clip(averages, 0, 255).astype(np.uint8)[None], cv2.COLOR_BGR2Lab)[0].astype(np.float32)
+	# every square joins the first square whose Lab colour is within
+	# tolerance, so anti-aliasing and compression noise stay in one colour
+	distances = np.linalg.norm(lab[:, None, :] - lab[None, :, :], axis=2)
+	first_match = np.argmax(distances < tolerance, axis=1)
+	leaders, labels = np.unique(first_match, return_inverse=True)
+
+	for idx in range(len(leaders)):
+		colors_detected.append(tuple(averages[labels == idx].mean(axis=0)))
+	for square_idx, square in enumerate(squares):
+		color_map[int(labels[square_idx])].append((square_idx, square))
 	return color_map, colors_detected
 
-def extract_grid(grid_image):
-	cells = extract_cells(grid_image)
+def extract_grid(grid_image, debug=None):
+	cells = extract_cells(grid_image, debug)
 
 	if len(cells) == 0:
 		return None,None
@@ -181,80 +388,122 @@ def extract_grid(grid_image):
 
 	return cells, grid
 
-def click_mouse(x, y):
-	pyautogui.click(x, y, _pause=False, interval=0)
-	# pyautogui.click(x, y, _pause=False, interval=0)
-	# pyautogui.click(x, y)
-
-def solve_puzzle(offset_x, offset_y, cells, grid):
-	global have_highdpi
-	global double_click
-
-	solution = solve(grid)
-	for i in range(len(solution)):
-		index = i * len(solution) + solution[i]
-		x, y, w, h = cells[index]
-		if have_highdpi:
-			click_mouse(offset_x + x // 2 + 10, offset_y + y // 2 + 10)
-			if double_click:
-				click_mouse(offset_x + x // 2 + 10, offset_y + y // 2 + 10)
-		else:
-			click_mouse(offset_x + x + 10, offset_y + y + 10)
-			if double_click:
-				click_mouse(offset_x + x + 10, offset_y + y + 10)
-
-stop_flag = False
-capture_flag = False
-
-def on_press(key):
-	global stop_flag
-	global capture_flag
-	try:
-		if key.char == 'q':  # Exit the program when 'q' is pressed
-			print("Exiting...")
-			stop_flag = True
-			return False  # Stop the listener
-		if key.char == 'c':
-			capture_flag = not capture_flag
-			print(f"Capture flag: {capture_flag}")
-	except AttributeError:
-		pass  # Handle special keys (if needed)
-
-def keyboard_listener():
-	# Start the listener in a blocking way
-	with keyboard.Listener(on_press=on_press) as listener:
-		listener.join()
+def load_screenshot(filename):
+	# mss grabs BGRA frames, keep files in the same layout
+	image = cv2.imread(filename, cv2.IMREAD_UNCHANGED)
+	if image is not None and image.ndim == 2:
+		image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGRA)
+	elif image is not None and image.shape[2] == 3:
+		image = cv2.cvtColor(image, cv2.COLOR_BGR2BGRA)
+	return image
+
+def solve_image_stages(filename, result):
+	times = result['times']
+	start = time.perf_counter()
+	image = load_screenshot(filename)
+	times['load'] = time.perf_counter() - start
+	if image is None:
+		return
+
+	start = time.perf_counter()
+	detected = detect_grid(image)
+	times['detect_grid'] = time.perf_counter() - start
+	if detected is None:
+		return
+	grid_image, _ = detected
+
+	start = time.perf_counter()
+	cells, grid = extract_grid(grid_image)
+	times['extract_grid'] = time.perf_counter() - start
+	if grid is None:
+		return
+	result['paving'] = grid.tolist()
+
+	start = time.perf_counter()
+	result['solution'] = solve(grid)
+	times['solve'] = time.perf_counter() - start
+
+def solve_image(filename):
+	result = {'file': filename, 'paving': None, 'solution': None, 'error': None, 'times': {}}
+	# the pipeline prints diagnostics, keep stdout for the json lines
+	with contextlib.redirect_stdout(io.StringIO()):
+		try:
+			solve_image_stages(filename, result)
+		except Exception as error:
+			# one bad capture must not take the rest of the batch down
+			result['error'] = f"{type(error).__name__}: {error}"
+	return result
+
+def batch_main(directory, workers=None):
+	filenames = sorted(glob.glob(os.path.join(directory, '*.png')))
+	start = time.perf_counter()
+	solved = 0
+	failed = 0
+	stage_totals = defaultdict(float)
+	with ProcessPoolExecutor(max_workers=workers) as executor:
+		for result in executor.map(solve_image, filenames):
+			solved += result['solution'] is not None
+			failed += result['error'] is not None
+			for stage, seconds in result['times'].items():
+				stage_totals[stage] += seconds
+			print(json.dumps(result), flush=True)
+	elapsed = time.perf_counter() - start
+	rate = len(filenames) / elapsed if elapsed > 0 else 0
+	print(f"Solved {solved}/{len(filenames)} images in {elapsed:.3f} s ({rate:.1f} images/s), {failed} raised an error", file=sys.stderr)
+	for stage, seconds in stage_totals.items():
+		print(f"  {stage}: {seconds / max(len(filenames), 1) * 1e3:.3f} ms/image", file=sys.stderr)
+
+def screen_scale():
+	return 2 if have_highdpi else 1
+
+class QueensSolver(PuzzleSolver):
+	name = 'queens'
+
+	def __init__(self, debug=None):
+		self.debug = debug
+
+	def detect(self, frame):
+		return detect_grid(frame)
+
+	def extract(self, grid_image):
+		cells, grid = extract_grid(grid_image, self.debug)
+		return None if grid is None else (cells, grid)
+
+	def solve(self, puzzle):
+		return solve(puzzle[1])
+
+	def clicks(self, rect, puzzle, solution):
+		cells, _ = puzzle
+		n = len(solution)
+		count = 2 if double_click else 1
+		targets = []
+		for i in range(n):
+			x, y, w, h = cells[i * n + solution[i]]
+			targets.append((x + w // 2, y + h // 2, count))
+		return targets
 
 def main():
-	global stop_flag
-	global capture_flag
-	global have_highdpi
-
-	listener_thread = threading.Thread(target=keyboard_listener)
-	listener_thread.start()
-	last_x, last_y = 0, 0
-	solution = [0, 4, 7, 5, 2, 6, 1, 3]
-	with mss.mss() as sct:
-		while not stop_flag:
-			screen = np.array(sct.grab(sct.monitors[0]))
-
-			if capture_flag:
-				grid_image, (x, y, w, h) = detect_grid(screen)
-				if grid_image is not None:
-					cells, grid = extract_grid(grid_image)
-					if grid is not None:
-						print(x,y)
-						if x == last_x and y == last_y:
-							if have_highdpi:
-								solve_puzzle(x//2, y//2, cells, grid)
-							else:
-								solve_puzzle(x, y, cells, grid)
-								
-							capture_flag = False
-				last_x, last_y = x, y
-			cv2.waitKey(1)
-		cv2.destroyAllWindows()
+	debug = DebugImages(debug_dir) if debug_dir is not None else None
+	Runtime([QueensSolver(debug)], clicker_name, screen_scale(), stable_frames, timings_file).run()
+	cv2.destroyAllWindows()
 
 
 if __name__ == "__main__":
-	main()
+	parser = argparse.ArgumentParser()
+	parser.add_argument('--count', metavar='PAVING', help="count the solutions of a paving file instead of watching the screen")
+	parser.add_argument('--limit', type=int, default=None, help="stop counting after this many solutions (2 checks uniqueness)")
+	parser.add_argument('--batch', metavar='DIR', help="solve every png screenshot in a directory, one json line per image")
+	parser.add_argument('--workers', type=int, default=None, help="worker processes for --batch")
+	parser.add_argument('--debug-dir', metavar='DIR', help="write the intermediate images of every extracted frame to DIR")
+	parser.add_argument('--clicker', choices=sorted(clickers), default=clicker_name, help="input backend for the solution clicks (dry-run records them)")
+	parser.add_argument('--timings', metavar='JSON', help="time every stage from the start, 'p' prints p50/p95/p99 and writes them to JSON")
+	args = parser.parse_args()
+	debug_dir = args.debug_dir
+	clicker_name = args.clicker
+	timings_file = args.timings
+	if args.count:
+		count_main(args.count, args.limit)
+	elif args.batch:
+		batch_main(args.batch, args.workers)
+	else:
+		main()
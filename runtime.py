@@ -0,0 +1,167 @@
+import threading
+import time
+from actuate import make_clicker, to_screen
+from capture import RegionTracker, FrameChangeDetector, FpsCounter, run_pipeline
+import timing
+
+class PuzzleSolver:
+	# one puzzle type for the runtime: detect(frame) -> (grid_image,
+	# (x, y, w, h)) or None, extract(grid_image) -> puzzle or None when the
+	# grid is not this puzzle, solve(puzzle) -> solution or None, and
+	# clicks(rect, puzzle, solution) -> [(x, y, count)] in grid pixels
+
+	name = None
+
+	def detect(self, frame):
+		raise NotImplementedError
+
+	def extract(self, grid_image):
+		raise NotImplementedError
+
+	def solve(self, puzzle):
+		raise NotImplementedError
+
+	def clicks(self, rect, puzzle, solution):
+		raise NotImplementedError
+
+	def actuate(self, clicker, rect, puzzle, solution, scale=1):
+		targets = self.clicks(rect, puzzle, solution)
+		points = to_screen([(x, y) for x, y, _ in targets], rect[0], rect[1], scale)
+		clicker.click_all([(x, y, count) for (x, y), (_, _, count) in zip(points, targets)])
+
+class Runtime:
+	# screen capture, ROI tracking, frame skipping, threads, hotkeys and
+	# stage timing shared by every puzzle; the first solver whose extract
+	# accepts the grid gets it. mss and pynput are only imported once it
+	# runs, so the solver modules stay importable without a display
+
+	def __init__(self, solvers, clicker='pynput', scale=None, stable_frames=1, timings_file=None):
+		self.solvers = list(solvers)
+		self.clicker = make_clicker(clicker)
+		# frame pixels per screen point, measured by the tracker when None
+		self.scale = scale
+		self.stable_frames = stable_frames
+		self.stop_flag = False
+		self.capture_flag = False
+		self.tracker = RegionTracker()
+		self.changes = FrameChangeDetector()
+		self.fps = FpsCounter("capture")
+		# the fps line is off until 'f'; timing starts on when its JSON export
+		# is wanted, 't' toggles it
+		self.timings_file = timings_file
+		timing.enable(timings_file is not None)
+		self.last = {'solver': None, 'puzzle': None, 'rect': None, 'seen_at': None}
+		# set by act after clicking; only the vision thread touches the
+		# change detector and last, so it does the reset
+		self.solved = threading.Event()
+
+	def on_press(self, key):
+		try:
+			if key.char == 'q':
+				print("Exiting...")
+				self.stop_flag = True
+				return False
+			if key.char == 'c':
+				self.capture_flag = not self.capture_flag
+				print(f"Capture flag: {self.capture_flag}")
+			if key.char == 't':
+				timing.enable(not timing.enabled)
+				print(f"Timing: {timing.enabled}")
+			if key.char == 'p':
+				self.report_timings()
+			if key.char == 'f':
+				self.fps.toggle()
+				print(f"Fps counter: {self.fps.enabled}")
+		except AttributeError:
+			pass
+
+	def keyboard_listener(self):
+		from pynput import keyboard
+		with keyboard.Listener(on_press=self.on_press) as listener:
+			listener.join()
+
+	def frames(self):
+		import mss
+		with mss.mss() as sct:
+			while not self.stop_flag:
+				if self.capture_flag:
+					captured_at = time.perf_counter()
+					with timing.span('runtime.grab'):
+						captured = self.tracker.grab(sct)
+					yield captured_at, captured
+				else:
+					time.sleep(0.01)
+
+	def find(self, frame):
+		# the solver that took the last grid is asked first
+		for solver in self.solvers:
+			with timing.span(f'runtime.{solver.name}.detect'):
+				detected = solver.detect(frame)
+			if detected is None:
+				continue
+			with timing.span(f'runtime.{solver.name}.extract'):
+				puzzle = solver.extract(detected[0])
+			if puzzle is not None:
+				self.solvers.remove(solver)
+				self.solvers.insert(0, solver)
+				return solver, puzzle, detected[1]
+		return None
+
+	def vision(self, captured_at, captured):
+		frame, (offset_x, offset_y) = captured
+		last = self.last
+		if self.solved.is_set():
+			self.solved.clear()
+			self.changes.reset()
+			last['seen_at'] = None
+		changed = self.changes.changed(frame)
+		self.fps.tick(frame, skipped=not changed)
+		if changed:
+			found = self.find(frame)
+			if found is None:
+				last['solver'] = None
+			else:
+				last['solver'], last['puzzle'], (x, y, w, h) = found
+				last['rect'] = (x + offset_x, y + offset_y, w, h)
+				self.tracker.track(*last['rect'])
+		if last['solver'] is None:
+			self.tracker.lose()
+			last['seen_at'] = None
+			return None
+		if last['seen_at'] is None:
+			last['seen_at'] = captured_at
+		# the grid is only trusted once the screen has settled
+		if self.changes.still_frames >= self.stable_frames:
+			return last['solver'], last['puzzle'], last['rect'], last['seen_at']
+		return None
+
+	def act(self, result):
+		if not self.capture_flag:
+			return
+		solver, puzzle, rect, seen_at = result
+		started_at = time.perf_counter()
+		with timing.span(f'runtime.{solver.name}.solve'):
+			solution = solver.solve(puzzle)
+		if solution is None:
+			return
+		self.capture_flag = False
+		with timing.span('runtime.clicks'):
+			solver.actuate(self.clicker, rect, puzzle, solution, self.scale or self.tracker.scale)
+		done_at = time.perf_counter()
+		self.solved.set()
+		timing.record('runtime.seen_to_clicks_done', done_at - seen_at)
+		print(f"{solver.name}: grid seen -> actuation: {(started_at - seen_at) * 1e3:.1f} ms, -> clicks done ({self.clicker.name}): {(done_at - seen_at) * 1e3:.1f} ms")
+
+	def report_timings(self):
+		timing.report()
+		if self.timings_file is not None:
+			timing.export(self.timings_file)
+			print(f"Timings written to {self.timings_file}")
+
+	def run(self):
+		listener_thread = threading.Thread(target=self.keyboard_listener)
+		listener_thread.start()
+		run_pipeline(self.frames, self.vision, self.act, lambda: not self.stop_flag)
+		self.clicker.report()
+		if self.timings_file is not None:
+			self.report_timings()
@@ -0,0 +1,24 @@
+import argparse
+import cv2
+from actuate import clickers
+from queen_solver import DebugImages, QueensSolver
+from runtime import Runtime
+from tango_solver import TangoSolver
+
+# watches the screen for any supported puzzle: queens is asked first since
+# its extraction rejects grids that do not have one colour per row
+
+def main():
+	parser = argparse.ArgumentParser()
+	parser.add_argument('--clicker', choices=sorted(clickers), default='pynput', help="input backend for the solution clicks (dry-run records them)")
+	parser.add_argument('--scale', type=float, default=None, help="frame pixels per screen point (2 on retina), measured from the capture by default")
+	parser.add_argument('--stable-frames', type=int, default=1, help="unchanged frames before a grid is trusted")
+	parser.add_argument('--debug-dir', metavar='DIR', help="write the intermediate images of every extracted queens frame to DIR")
+	parser.add_argument('--timings', metavar='JSON', help="time every stage from the start, 'p' prints p50/p95/p99 and writes them to JSON")
+	args = parser.parse_args()
+	debug = DebugImages(args.debug_dir) if args.debug_dir is not None else None
+	Runtime([QueensSolver(debug), TangoSolver()], args.clicker, args.scale, args.stable_frames, args.timings).run()
+	cv2.destroyAllWindows()
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,120 @@
+from functools import lru_cache
+
+SUN = 1
+MOON = 2
+
+@lru_cache(maxsize=None)
+def legal_rows(n):
+	# rows as n-bit masks (bit c set = sun in column c) with n/2 suns and
+	# never three equal symbols in a row
+	full = (1 << n) - 1
+	rows = []
+	for row in range(1 << n):
+		if row.bit_count() != n // 2:
+			continue
+		moons = ~row & full
+		if row & (row >> 1) & (row >> 2) or moons & (moons >> 1) & (moons >> 2):
+			continue
+		rows.append(row)
+	return tuple(rows)
+
+def line_order(n, line):
+	# sun before moon from position 0 on, the order a cell-by-cell search
+	# trying SUN then MOON would list them in
+	return [MOON - (line >> i & 1) for i in range(n)]
+
+def iter_full_grids(n):
+	# every solved n x n grid, filled column by column; rows are tracked as
+	# masks by sun count so the row rules cost a few bit operations a column
+	columns = sorted(legal_rows(n), key=lambda line: line_order(n, line))
+	half = n // 2
+	full = (1 << n) - 1
+	chosen = []
+
+	def place(x, suns_at):
+		if x == n:
+			yield [[SUN if chosen[x] >> y & 1 else MOON for x in range(n)] for y in range(n)]
+			return
+		# rows with half suns take no more suns, rows with half moons no more moons
+		no_sun = suns_at[half]
+		no_moon = suns_at[x - half] if x >= half else 0
+		if x >= 2:
+			no_sun |= chosen[x - 2] & chosen[x - 1]
+			no_moon |= ~chosen[x - 2] & ~chosen[x - 1] & full
+		for column in columns:
+			if column & no_sun or ~column & no_moon:
+				continue
+			chosen.append(column)
+			yield from place(x + 1, [suns_at[0] & ~column] + [suns_at[k] & ~column | suns_at[k - 1] & column for k in range(1, half + 1)])
+			chosen.pop()
+
+	yield from place(0, [full] + [0] * half)
+
+def link_masks(n, links):
+	# per row: bits c where cell c and c + 1 must be equal / differ, and
+	# bits c where the cell and the one above must be equal / differ
+	same_right = [0] * n
+	diff_right = [0] * n
+	same_above = [0] * n
+	diff_above = [0] * n
+	for cell, cell_links in links.items():
+		for other, is_cross in cell_links:
+			(r1, c1), (r2, c2) = sorted((tuple(cell), tuple(other)))
+			if r1 == r2 and c2 == c1 + 1:
+				masks, row, bit = (diff_right if is_cross else same_right), r1, c1
+			elif c1 == c2 and r2 == r1 + 1:
+				masks, row, bit = (diff_above if is_cross else same_above), r2, c1
+			else:
+				continue
+			masks[row] |= 1 << bit
+	return same_right, diff_right, same_above, diff_above
+
+def line_candidates(n, givens, same_next, diff_next):
+	# legal lines that keep the givens (a list of 0/SUN/MOON) and the links
+	# between position c and c + 1
+	suns = sum(1 << c for c in range(n) if givens[c] == SUN)
+	moons = sum(1 << c for c in range(n) if givens[c] == MOON)
+	lines = []
+	for line in legal_rows(n):
+		changes = line ^ (line >> 1)
+		if line & suns != suns or line & moons:
+			continue
+		if changes & same_next or ~changes & diff_next:
+			continue
+		lines.append(line)
+	return lines
+
+def iter_tango_solutions(grid_symbole, links):
+	n = len(grid_symbole)
+	same_right, diff_right, same_above, diff_above = link_masks(n, links)
+
+	rows_allowed = [line_candidates(n, [grid_symbole[r][c] for c in range(n)], same_right[r], diff_right[r]) for r in range(n)]
+	columns_allowed = []
+	for c in range(n):
+		same_below = sum(1 << (r - 1) for r in range(1, n) if same_above[r] >> c & 1)
+		diff_below = sum(1 << (r - 1) for r in range(1, n) if diff_above[r] >> c & 1)
+		columns_allowed.append(line_candidates(n, [grid_symbole[r][c] for r in range(n)], same_below, diff_below))
+	# patterns each column can show on rows 0..r; filling rows top-down, a
+	# row is only kept while every column stays a prefix of a legal line
+	prefixes = [[{column & ((2 << r) - 1) for column in columns_allowed[c]} for r in range(n)] for c in range(n)]
+	rows = [0] * n
+
+	def fits(r, row, cols):
+		return all(cols[c] | (row >> c & 1) << r in prefixes[c][r] for c in range(n))
+
+	def place(r, cols, fitting):
+		for row in fitting:
+			rows[r] = row
+			if r == n - 1:
+				yield [[SUN if line >> c & 1 else MOON for c in range(n)] for line in rows]
+				continue
+			placed = [cols[c] | (row >> c & 1) << r for c in range(n)]
+			following = [line for line in rows_allowed[r + 1] if fits(r + 1, line, placed)]
+			if following:
+				yield from place(r + 1, placed, following)
+
+	first = [row for row in rows_allowed[0] if fits(0, row, [0] * n)]
+	yield from place(0, [0] * n, first)
+
+def solve_tango_grid(grid_symbole, links):
+	return next(iter_tango_solutions(grid_symbole, links), None)
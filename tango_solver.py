@@ -1,15 +1,22 @@
 import cv2
 import numpy as np
-import mss
 from collections import defaultdict
-import threading
-from pynput import keyboard
-import pyautogui
+from runtime import PuzzleSolver, Runtime
+import timing
+from tango_search import SUN, MOON, iter_full_grids, solve_tango_grid
+from tango_templates import EMPTY, EQUAL, CROSS, CELL, LINK, TemplateClassifier, patch_vectors
 
 have_highdpi = False
 double_click = True
-stop_flag = False
-capture_flag = False
+clicker_name = 'pynput'
+timings_file = None
+stable_frames = 1
+templates_file = "tango_templates.npz"
+# 'per-patch' until the one-pass 'components' classifier has been checked
+# against real Tango screenshots (python benchmark.py tango-vision);
+# 'templates' needs a templates_file built by build_tango_templates.py
+# from hand-checked labels, none ships with the repo
+recognizer = 'per-patch'
 
 def is_symbole_possible(grid_symbole, x, y, symbole):
 	old_symbole = grid_symbole[y, x]
@@ -20,11 +27,11 @@ def is_symbole_possible(grid_symbole, x, y, symbole):
 		grid_symbole[y, x] = old_symbole
 		return False
 	# check if there is 3 symbole in a row
-	for i in range(min(0, x-2), max(6, x+2)):
+	for i in range(max(0, x-2), min(x, 3)+1):
 		if (grid_symbole[y, i:i+3] == symbole).sum() == 3:
 			grid_symbole[y, x] = old_symbole
 			return False
-	for i in range(min(0, y-2), max(6, y+2)):
+	for i in range(max(0, y-2), min(y, 3)+1):
 		if (grid_symbole[i:i+3, x] == symbole).sum() == 3:
 			grid_symbole[y, x] = old_symbole
 			return False
@@ -51,12 +58,16 @@ def solve(solutions, grid, x, y):
 		solve(solutions, grid, x, y+1)
 		grid[y, x] = 0
 
-def generate_all_solutions():
+def generate_all_solutions_recursive():
 	grid = np.zeros((6, 6), dtype=np.uint8)
 	solutions = []
 	solve(solutions, grid, 0, 0)
 	return np.array(solutions)
 
+def generate_all_solutions(n=6):
+	return np.array(list(iter_full_grids(n)), dtype=np.uint8)
+
+@timing.timed('tango.detect_grid')
 def detect_grid(image):
 	line_extension=5
 	gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
@@ -84,6 +95,7 @@ def detect_grid(image):
 	if len(contours) == 0:
 		return None, (0,0,0,0)
 
+	w = h = 0
 	for contour in contours:
 		epsilon = 0.02 * cv2.arcLength(contour, True)
 		approx = cv2.approxPolyDP(contour, epsilon, True)
@@ -141,7 +153,7 @@ def detect_symbole_cross_equal(cell_image):
 				is_cross = False
 	return contain_symbole, is_cross
 
-def process_grid_image(grid_image):
+def process_grid_image_per_patch(grid_image):
 	grid_symbole = np.zeros((6, 6), dtype=np.uint32)
 	link = {}
 	w,h = grid_image.shape[:2]
@@ -180,6 +192,108 @@ def process_grid_image(grid_image):
 			link[(i // 6, i % 6)].append(((i // 6 + 1, i % 6), is_cross))
 	return grid_symbole, link
 
+def patch_regions(grid_image):
+	# (top, left, bottom, right) of the 36 cells, then of the 30 vertical
+	# and 30 horizontal link strips, cut like process_grid_image_per_patch
+	w, h = grid_image.shape[:2]
+	cell_w = w // 6
+	cell_h = h // 6
+	line_w = cell_w // 5
+	line_h = cell_h // 5
+	cells = [(i*cell_w, j*cell_h, (i+1)*cell_w, (j+1)*cell_h) for i in range(6) for j in range(6)]
+	vertical = []
+	horizontal = []
+	for i in range(1, 6):
+		for j in range(0, 6):
+			vertical.append((j*cell_h+cell_h//2-line_h, i*cell_w-line_w, j*cell_h+cell_h//2+line_h, i*cell_w+line_w))
+			horizontal.append((i*cell_h-line_h, j*cell_w+cell_w//2-line_w, i*cell_h+line_h, j*cell_w+cell_w//2+line_w))
+	return np.array(cells + vertical + horizontal)
+
+def component_shape(labels, stats, label):
+	# (is a symbol, has a convex outline) for one connected component
+	x, y, w, h = stats[label, :4]
+	mask = (labels[y:y+h, x:x+w] == label).astype(np.uint8)
+	contours, _ = cv2.findContours(mask, cv2.RETR_CCOMP, cv2.CHAIN_APPROX_SIMPLE)
+	is_symbol = False
+	for contour in contours:
+		epsilon = 0.02 * cv2.arcLength(contour, True)
+		approx = cv2.approxPolyDP(contour, epsilon, True)
+		if len(approx) <= 3:
+			continue
+		if cv2.isContourConvex(approx):
+			return True, True
+		is_symbol = True
+	return is_symbol, False
+
+def grid_binary(grid_image):
+	gray = cv2.cvtColor(grid_image, cv2.COLOR_BGR2GRAY)
+	blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+	return cv2.adaptiveThreshold(
+		blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV, 11, 2
+	)
+
+def region_groups(regions):
+	return np.array([CELL] * 36 + [LINK] * (len(regions) - 36))
+
+def classify_components(binary, regions):
+	# one component pass over the whole grid; every cell and link strip then
+	# only looks at the components lying inside it
+	_, labels, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+	top, left, bottom, right = (regions[:, k, None] for k in range(4))
+	height, width = bottom - top, right - left
+	x, y, w, h = (stats[None, 1:, k] for k in range(4))
+	inside = (x > left + 0.1 * width) & (y > top + 0.1 * height) & (x + w < left + 0.9 * width) & (y + h < top + 0.9 * height)
+
+	found = np.zeros(len(regions), dtype=bool)
+	convex = np.zeros(len(regions), dtype=bool)
+	for region, component in zip(*np.nonzero(inside)):
+		is_symbol, is_convex = component_shape(labels, stats, component + 1)
+		found[region] |= is_symbol
+		convex[region] |= is_convex
+
+	is_cell = region_groups(regions) == CELL
+	kinds = np.full(len(regions), EMPTY)
+	kinds[found & is_cell] = np.where(convex, SUN, MOON)[found & is_cell]
+	kinds[found & ~is_cell] = np.where(convex, EQUAL, CROSS)[found & ~is_cell]
+	return kinds
+
+template_classifiers = {}
+
+def load_templates(path=None):
+	# None when no template file has been built yet
+	path = path or templates_file
+	if path not in template_classifiers:
+		try:
+			template_classifiers[path] = TemplateClassifier.load(path)
+		except FileNotFoundError:
+			template_classifiers[path] = None
+	return template_classifiers[path]
+
+def classify_regions(grid_image):
+	binary = grid_binary(grid_image)
+	regions = patch_regions(grid_image)
+	if recognizer == 'templates':
+		classifier = load_templates()
+		if classifier is not None:
+			return classifier.classify(patch_vectors(binary, regions), region_groups(regions))
+	return classify_components(binary, regions)
+
+def kinds_to_grid(kinds):
+	grid_symbole = kinds[:36].reshape(6, 6).astype(np.uint32)
+	link = {}
+	for i in np.flatnonzero(kinds[36:66] != EMPTY).tolist():
+		link.setdefault((i % 6, i // 6), []).append(((i % 6, i // 6 + 1), bool(kinds[36 + i] == CROSS)))
+	for i in np.flatnonzero(kinds[66:] != EMPTY).tolist():
+		link.setdefault((i // 6, i % 6), []).append(((i // 6 + 1, i % 6), bool(kinds[66 + i] == CROSS)))
+	return grid_symbole, link
+
+@timing.timed('tango.process_grid_image')
+def process_grid_image(grid_image):
+	# a missing template file falls back to the default detector
+	if recognizer == 'per-patch' or (recognizer == 'templates' and load_templates() is None):
+		return process_grid_image_per_patch(grid_image)
+	return kinds_to_grid(classify_regions(grid_image))
+
 def extract_tango_grid(filename):
 	grid_image = detect_grid(filename)
 	if grid_image is None:
@@ -202,48 +316,6 @@ def solution_is_valid(solution, grid_symbole, links):
 					return False
 	return True
 
-def solve_tango(solutions, grid_symbole, links):
-	for solution in solutions:
-		if solution_is_valid(solution, grid_symbole, links):
-			return solution
-	return None
-
-def solve_puzzle(offset_x, offset_y, grid_w, grid_h, solutions, grid_symbole, links):
-	global capture_flag
-
-	solution = solve_tango(solutions, grid_symbole, links)
-	if solution is not None:
-		cell_w = grid_w // 6
-		cell_h = grid_h // 6
-		capture_flag = False
-		for i in range(6):
-			for j in range(6):
-				if grid_symbole[i][j] != 0:
-					continue
-				x = offset_x + j * cell_w + cell_w // 2
-				y = offset_y + i * cell_h + cell_h // 2
-				for k in range(0, solution[i][j]):
-					pyautogui.click(x, y, _pause=False, interval=0)
-
-def on_press(key):
-	global stop_flag
-	global capture_flag
-	try:
-		if key.char == 'q':  # Exit the program when 'q' is pressed
-			print("Exiting...")
-			stop_flag = True
-			return False  # Stop the listener
-		if key.char == 'c':
-			capture_flag = not capture_flag
-			print(f"Capture flag: {capture_flag}")
-	except AttributeError:
-		pass  # Handle special keys (if needed)
-
-def keyboard_listener():
-	# Start the listener in a blocking way
-	with keyboard.Listener(on_press=on_press) as listener:
-		listener.join()
-
 def load_solutions():
 	try:
 		return np.load("solution.npy")
@@ -252,31 +324,68 @@ def load_solutions():
 		np.save("solution.npy", solutions)
 		return solutions
 
+def filter_tango_solutions(solutions, grid_symbole, links):
+	# every solution of the (S, n, n) table that keeps the givens and links
+	givens = grid_symbole != 0
+	keep = (solutions[:, givens] == grid_symbole[givens]).all(axis=1)
+	pairs = [(cell, other, is_cross) for cell, cell_links in links.items() for other, is_cross in cell_links]
+	if pairs:
+		cells = np.array([cell for cell, _, _ in pairs])
+		others = np.array([other for _, other, _ in pairs])
+		crosses = np.array([is_cross for _, _, is_cross in pairs])
+		differ = solutions[:, cells[:, 0], cells[:, 1]] != solutions[:, others[:, 0], others[:, 1]]
+		keep &= (differ == crosses).all(axis=1)
+	return solutions[keep]
+
+def solve_tango_with_table(solutions, grid_symbole, links):
+	matches = filter_tango_solutions(solutions, grid_symbole, links)
+	if len(matches) != 1:
+		print(f"{len(matches)} solutions match the grid")
+	return matches[0] if len(matches) else None
+
+@timing.timed('tango.solve_tango')
+def solve_tango(grid_symbole, links):
+	solution = solve_tango_grid(grid_symbole.tolist(), links)
+	if solution is None:
+		return None
+	return np.array(solution, dtype=grid_symbole.dtype)
+
+def screen_scale():
+	return 2 if have_highdpi else 1
+
+class TangoSolver(PuzzleSolver):
+	name = 'tango'
+
+	def detect(self, frame):
+		grid_image, rect = detect_grid(frame)
+		return None if grid_image is None else (grid_image, rect)
+
+	def extract(self, grid_image):
+		grid_symbole, links = process_grid_image(grid_image)
+		# a tango grid always starts with some suns and moons
+		if not grid_symbole.any():
+			return None
+		return grid_symbole, links
+
+	def solve(self, puzzle):
+		return solve_tango(*puzzle)
+
+	def clicks(self, rect, puzzle, solution):
+		grid_symbole, _ = puzzle
+		cell_w = rect[2] // 6
+		cell_h = rect[3] // 6
+		targets = []
+		for i in range(6):
+			for j in range(6):
+				if grid_symbole[i][j] != 0:
+					continue
+				# one click for a sun, two for a moon
+				targets.append((j * cell_w + cell_w // 2, i * cell_h + cell_h // 2, int(solution[i][j])))
+		return targets
+
 def main():
-	global stop_flag
-	global capture_flag
-	global have_highdpi
-
-	listener_thread = threading.Thread(target=keyboard_listener)
-	listener_thread.start()
-	last_x, last_y = 0, 0
-	solutions = load_solutions()
-	with mss.mss() as sct:
-		while not stop_flag:
-			screen = np.array(sct.grab(sct.monitors[0]))
-
-			if capture_flag:
-				grid_image, (x, y, w, h) = detect_grid(screen)
-				if grid_image is not None:
-					grid_symbole, links = process_grid_image(grid_image)
-					if x == last_x and y == last_y:
-						if have_highdpi:
-							solve_puzzle(x//2, y//2, w//2, h//2, solutions, grid_symbole, links)
-						else:
-							solve_puzzle(x, y, w, h, solutions, grid_symbole, links)								
-				last_x, last_y = x, y
-			cv2.waitKey(1)
-		cv2.destroyAllWindows()
+	Runtime([TangoSolver()], clicker_name, screen_scale(), stable_frames, timings_file).run()
+	cv2.destroyAllWindows()
 
 if __name__ == "__main__":
 	main()
@@ -0,0 +1,53 @@
+import cv2
+import numpy as np
+
+# patch kinds: EMPTY, SUN and MOON (as in tango_search) for cells, EMPTY,
+# EQUAL and CROSS for links
+EMPTY = 0
+EQUAL = 3
+CROSS = 4
+CELL = 0
+LINK = 1
+PATCH = 16
+
+def patch_vectors(binary, regions):
+	# every (top, left, bottom, right) region of the binary grid image as a
+	# PATCH x PATCH ink density map, one row per region
+	vectors = np.empty((len(regions), PATCH * PATCH), dtype=np.float32)
+	for k, (top, left, bottom, right) in enumerate(regions):
+		patch = cv2.resize(binary[max(top, 0):bottom, max(left, 0):right], (PATCH, PATCH), interpolation=cv2.INTER_AREA)
+		vectors[k] = patch.reshape(-1)
+	return vectors / 255
+
+class TemplateClassifier:
+	# nearest template per patch; templates of the other group (cell or
+	# link) are never candidates
+
+	def __init__(self, templates, kinds, groups):
+		self.templates = np.asarray(templates, dtype=np.float32)
+		self.kinds = np.asarray(kinds)
+		self.groups = np.asarray(groups)
+		self.norms = (self.templates ** 2).sum(axis=1)
+
+	@classmethod
+	def load(cls, path):
+		data = np.load(path)
+		return cls(data['templates'], data['kinds'], data['groups'])
+
+	def save(self, path):
+		np.savez(path, templates=self.templates, kinds=self.kinds, groups=self.groups)
+
+	@classmethod
+	def from_examples(cls, vectors, kinds, groups):
+		# one template per (group, kind): the mean of its labelled patches
+		vectors, kinds, groups = np.asarray(vectors), np.asarray(kinds), np.asarray(groups)
+		classes = sorted(set(zip(groups.tolist(), kinds.tolist())))
+		templates = [vectors[(groups == group) & (kinds == kind)].mean(axis=0) for group, kind in classes]
+		return cls(templates, [kind for _, kind in classes], [group for group, _ in classes])
+
+	def classify(self, vectors, groups):
+		# |v - t|^2 up to the |v|^2 term shared by a row, for all patches and
+		# templates in one product
+		distances = self.norms[None, :] - 2 * vectors @ self.templates.T
+		distances[groups[:, None] != self.groups[None, :]] = np.inf
+		return self.kinds[distances.argmin(axis=1)]
@@ -0,0 +1,91 @@
+import functools
+import json
+import time
+from collections import defaultdict, deque
+
+# per-stage latency spans; off by default, and then a span is a shared no-op
+# and a timed function pays one flag check per call
+enabled = False
+window = 1000
+samples = defaultdict(lambda: deque(maxlen=window))
+
+class Span:
+	__slots__ = ('name', 'start')
+
+	def __init__(self, name):
+		self.name = name
+
+	def __enter__(self):
+		self.start = time.perf_counter()
+
+	def __exit__(self, *exc_info):
+		samples[self.name].append(time.perf_counter() - self.start)
+
+class NoSpan:
+
+	def __enter__(self):
+		pass
+
+	def __exit__(self, *exc_info):
+		pass
+
+no_span = NoSpan()
+
+def span(name):
+	return Span(name) if enabled else no_span
+
+def timed(name):
+	def decorator(function):
+		@functools.wraps(function)
+		def wrapper(*args, **kwargs):
+			if not enabled:
+				return function(*args, **kwargs)
+			start = time.perf_counter()
+			try:
+				return function(*args, **kwargs)
+			finally:
+				samples[name].append(time.perf_counter() - start)
+		return wrapper
+	return decorator
+
+def record(name, seconds):
+	if enabled:
+		samples[name].append(seconds)
+
+def enable(on=True):
+	global enabled
+	enabled = on
+
+def percentile(ordered, fraction):
+	return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+def summary():
+	# the rolling window of every stage, in milliseconds
+	stages = {}
+	for name, times in list(samples.items()):
+		ordered = sorted(times)
+		if not ordered:
+			continue
+		stages[name] = {
+			'count': len(ordered),
+			'p50': percentile(ordered, 0.50) * 1e3,
+			'p95': percentile(ordered, 0.95) * 1e3,
+			'p99': percentile(ordered, 0.99) * 1e3,
+			'max': ordered[-1] * 1e3,
+		}
+	return stages
+
+def report():
+	if not enabled and not samples:
+		print("Timing is off.")
+		return
+	print(f"{'stage':<30} {'n':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+	for name, stage in summary().items():
+		print(f"{name:<30} {stage['count']:>6} {stage['p50']:>9.3f} {stage['p95']:>9.3f} {stage['p99']:>9.3f} {stage['max']:>9.3f}")
+
+def export(path):
+	with open(path, 'w') as f:
+		json.dump(summary(), f, indent=1)
+
+def reset():
+	samples.clear()